@@ -0,0 +1,209 @@
+import numpy
+import player
+import tile
+
+"""
+This module defines an array representation of the tiles of a board, used by
+`board.Board` when created with `array_mode=True`: the four side colors of
+each cell are stored as small integers in a NumPy array, along with an
+occupancy mask, so that the compatibility checks between a tile and the
+neighbours of every frontier cell are computed by vectorised slices instead
+of Python loops over cells. The frontier itself is not derived from the
+arrays: the board maintains it incrementally, which is much cheaper than a
+scan of the arrays.
+
+Colors are coded by `player.COLOR_CODE`, `NO_COLOR` meaning that there is no
+link on the side (or no tile in the cell).
+
+`tile` (which depends on `player`, which depends on this module) is only
+accessed at call time, so that the modules may be imported in any order.
+"""
+
+
+NO_COLOR = 0
+
+# The smallest number of rows and columns of the arrays.
+MIN_CAPACITY = 8
+
+# The index of the side facing each side of `tile.SIDES`, on the neighbouring
+# tile.
+_FACING = (2, 3, 0, 1)
+
+_side_color_codes = {}
+
+
+def side_color_codes(tile_type):
+    """
+    Return the side colors of each rotation of `tile_type`, as a 4x4 array of
+    color codes whose rows are indexed by rotation and columns by side.
+    """
+    codes = _side_color_codes.get(tile_type.type_id)
+    if codes is None:
+        codes = numpy.array(
+            [
+                [
+                    NO_COLOR if color is None else player.COLOR_CODE[color]
+                    for color in tile_type.side_colors(rotation)
+                ]
+                for rotation in range(len(tile.SIDES))
+            ],
+            dtype=numpy.int8,
+        )
+        _side_color_codes[tile_type.type_id] = codes
+    return codes
+
+
+class ArrayBoard:
+    """
+    The side colors of the placed tiles, as a `(height, width, 4)` array of
+    color codes (`sides`), and their occupancy, as a `(height, width)` boolean
+    array (`occupied`). Cells are addressed by the absolute coordinates of
+    `board.Board`; the arrays cover the bounding box of the placed tiles and
+    at least a two-cell margin of empty cells, and are doubled in size when a
+    tile is placed outside of them, so that placements are constant-time on
+    average.
+    """
+
+    def __init__(self, capacity=MIN_CAPACITY):
+        capacity = max(capacity, MIN_CAPACITY)
+        self._sides = numpy.zeros(
+            (capacity, capacity, len(tile.SIDES)), dtype=numpy.int8
+        )
+        self._occupied = numpy.zeros((capacity, capacity), dtype=bool)
+        # absolute coordinates of the cell at index `(0, 0)` of the arrays
+        self._row_origin = -(capacity // 2)
+        self._column_origin = -(capacity // 2)
+
+    @property
+    def sides(self):
+        return self._sides
+
+    @property
+    def occupied(self):
+        return self._occupied
+
+    @property
+    def origin(self):
+        """
+        The absolute `(row, column)` coordinates of the cell at index `(0, 0)`
+        of the arrays.
+        """
+        return self._row_origin, self._column_origin
+
+    def _grow(self, row, column):
+        """
+        Reallocate the arrays so that the cell at the passed absolute
+        coordinates is at least two cells away from their borders (so that
+        the neighbours of its neighbours are within the arrays).
+        """
+        height, width = self._occupied.shape
+        while not (
+            self._row_origin + 1 < row < self._row_origin + height - 2
+            and self._column_origin + 1 < column < self._column_origin + width - 2
+        ):
+            # double the size, keeping the current content in the middle
+            new_height, new_width = 2 * height, 2 * width
+            top, left = height // 2, width // 2
+            bottom, right = top + height, left + width
+            sides = numpy.zeros(
+                (new_height, new_width, len(tile.SIDES)), dtype=numpy.int8
+            )
+            occupied = numpy.zeros((new_height, new_width), dtype=bool)
+            sides[top:bottom, left:right] = self._sides
+            occupied[top:bottom, left:right] = self._occupied
+            self._sides, self._occupied = sides, occupied
+            self._row_origin -= top
+            self._column_origin -= left
+            height, width = new_height, new_width
+
+    def place_at(self, row, column, tile_):
+        """
+        Record `tile_` at the passed absolute coordinates.
+        """
+        self._grow(row, column)
+        index = (row - self._row_origin, column - self._column_origin)
+        self._sides[index] = side_color_codes(tile_.tile_type)[tile_.rotation]
+        self._occupied[index] = True
+
+    def remove_at(self, row, column):
+        """
+        Empty the cell at the passed absolute coordinates.
+        """
+        index = (row - self._row_origin, column - self._column_origin)
+        self._sides[index] = NO_COLOR
+        self._occupied[index] = False
+
+    def facing_colors(self, rows, columns):
+        """
+        Return the colors facing each side of the cells whose absolute
+        coordinates are passed (as two arrays), i.e. the color of the facing
+        side of each neighbouring tile, as a `(len(rows), 4)` array of color
+        codes. The cells must be within the arrays, e.g. frontier cells.
+        """
+        rows = numpy.asarray(rows) - self._row_origin
+        columns = numpy.asarray(columns) - self._column_origin
+        sides = self._sides
+        return numpy.stack(
+            (
+                sides[rows - 1, columns, _FACING[0]],
+                sides[rows, columns + 1, _FACING[1]],
+                sides[rows + 1, columns, _FACING[2]],
+                sides[rows, columns - 1, _FACING[3]],
+            ),
+            axis=-1,
+        )
+
+    def neighbour_sides(self, rows, columns):
+        """
+        Return the side colors of the neighbours of the cells whose absolute
+        coordinates are passed (as two arrays), as a `(len(rows), 4, 4)`
+        array of color codes indexed by cell, by neighbour (in the order of
+        `tile.SIDES`) and by side of the neighbour. The cells must be within
+        the arrays, e.g. frontier cells.
+        """
+        rows = numpy.asarray(rows) - self._row_origin
+        columns = numpy.asarray(columns) - self._column_origin
+        sides = self._sides
+        return numpy.stack(
+            (
+                sides[rows - 1, columns],
+                sides[rows, columns + 1],
+                sides[rows + 1, columns],
+                sides[rows, columns - 1],
+            ),
+            axis=1,
+        )
+
+    def compatibility(self, rows, columns, tile_type, rotations):
+        """
+        Return whether the tile of type `tile_type` may be placed with each
+        of the passed rotations in each of the cells whose absolute
+        coordinates are passed, as a `(len(rows), len(rotations))` boolean
+        array: a placement is compatible if no link of the tile meets a link
+        of another color on a neighbouring tile.
+        """
+        facing = self.facing_colors(rows, columns)[:, numpy.newaxis, :]
+        colors = side_color_codes(tile_type)[list(rotations)][numpy.newaxis, :, :]
+        return ((facing == NO_COLOR) | (colors == NO_COLOR) | (facing == colors)).all(
+            axis=-1
+        )
+
+
+def neighbour_sides(board, rows, columns):
+    """
+    Same as `ArrayBoard.neighbour_sides` for `board` (a `board.Board`), using
+    its array mirror in array mode, and its tiles otherwise.
+    """
+    if board.array is not None:
+        return board.array.neighbour_sides(rows, columns)
+    num_sides = len(tile.SIDES)
+    result = numpy.zeros((len(rows), num_sides, num_sides), dtype=numpy.int8)
+    for index, (row, column) in enumerate(zip(rows, columns)):
+        for neighbour, side in enumerate(tile.SIDES):
+            delta_row, delta_column = tile.SIDE_DELTAS[side]
+            tile_ = board.tile_at(row + delta_row, column + delta_column)
+            if tile_ is not None:
+                result[index, neighbour] = side_color_codes(tile_.tile_type)[
+                    tile_.rotation
+                ]
+    return result
@@ -0,0 +1,679 @@
+import argparse
+import board
+import dataclasses
+import deck
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import player
+import random
+import record
+import simulation
+import statistics
+import sys
+import tempfile
+import tile
+import time
+import tracemalloc
+import utils
+
+"""
+This module is a benchmark suite for the hot paths of the engine, and can be
+executed to time them, e.g. `python benchmark.py --output results.json`.
+
+Each benchmark is run at several sizes (the number of tiles of the board, of
+the deck, or of rotated tiles), several times, the best and median times being
+kept; the time per operation and the scaling exponent between consecutive
+sizes (1 for a linear cost) give the scaling curve of the benchmark.
+
+The results can be written as JSON (see `--output`), and are compared with a
+stored baseline (see `--baseline` and `--save-baseline`): a benchmark slower
+than its baseline by more than the tolerance is reported as a regression,
+and the exit status is then 1.
+
+The memory used by the decks and by the most numerous objects is reported
+separately (see `--memory`), as measured by `tracemalloc`.
+"""
+
+
+# The file where the baseline is stored, by default.
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+# The version of the format of the results.
+FORMAT_VERSION = 1
+
+# The line-up of the benchmarked games (see `simulation.parse_lineup`).
+DEFAULT_LINEUP = "ai:hard,ai:easy,random"
+
+# The number of calls timed by the benchmarks of board queries whose cost
+# does not depend on the number of calls.
+NUM_QUERIES = 100
+
+
+@dataclasses.dataclass(frozen=True)
+class Measurement:
+    """
+    The timing of a benchmark at a size: the best and median wall-clock times
+    in seconds over `repeat` runs, each run performing `operations`
+    operations.
+    """
+
+    name: str
+    size: int
+    operations: int
+    repeat: int
+    best: float
+    median: float
+
+    @property
+    def per_operation(self):
+        return self.best / self.operations
+
+    def to_json(self):
+        result = dataclasses.asdict(self)
+        result["per_operation"] = self.per_operation
+        return result
+
+
+def _cells(size):
+    """
+    Return the absolute coordinates of `size` cells filling a square row by
+    row, each cell being adjacent to a previous one.
+    """
+    side = math.isqrt(size - 1) + 1
+    return [divmod(index, side) for index in range(size)]
+
+
+def _tiles(size, rng):
+    """
+    Return `size` shared tiles, taken from the default deck in turn and
+    randomly rotated.
+    """
+    tiles = deck.make_tiles()
+    return [
+        tiles[index % len(tiles)].rotated(rng.randrange(tile.NUM_ROTATIONS))
+        for index in range(size)
+    ]
+
+
+def _filled_board(size, rng, array_mode=False):
+    """
+    Return a board holding `size` tiles (see `_cells`), in array mode if
+    `array_mode` is true.
+    """
+    board_ = board.Board(array_mode=array_mode)
+    for (row, column), tile_ in zip(_cells(size), _tiles(size, rng)):
+        board_.place_at(row, column, tile_)
+    return board_
+
+
+def _deck_file(directory, size):
+    """
+    Write a deck file of `size` tiles, taken from the default deck in turn,
+    into `directory`, and return its path.
+    """
+    with open(os.path.join(os.path.dirname(__file__), "default.deck")) as file:
+        lines = [
+            line.strip()
+            for line in file
+            if line.strip() and not line.startswith(deck.COMMENT_SIGN)
+        ]
+    path = os.path.join(directory, f"benchmark-{size}.deck")
+    with open(path, "w") as file:
+        for line in itertools.islice(itertools.cycle(lines), size):
+            file.write(line)
+            file.write("\n")
+    return path
+
+
+# Each benchmark takes a size, a random generator and a temporary directory,
+# prepares its data, and returns the function to time along with the number
+# of operations it performs.
+
+
+def bench_board_setitem(size, rng, directory):
+    """
+    Place `size` tiles through `Board.__setitem__` into an empty board, which
+    grows with them.
+    """
+    cells = _cells(size)
+    tiles = _tiles(size, rng)
+
+    def run():
+        board_ = board.Board()
+        for (row, column), tile_ in zip(cells, tiles):
+            board_[board_.to_relative(row, column)] = tile_
+
+    return run, size
+
+
+def bench_adjacent_positions(size, rng, directory):
+    """
+    List `NUM_QUERIES` times the positions adjacent to the tiles of a board of
+    `size` tiles.
+    """
+    board_ = _filled_board(size, rng)
+
+    def run():
+        for _ in range(NUM_QUERIES):
+            board_.get_adjacent_positions()
+
+    return run, NUM_QUERIES
+
+
+def bench_is_path_closed(size, rng, directory):
+    """
+    Check whether the paths of each tile of a board of `size` tiles are
+    closed.
+    """
+    board_ = _filled_board(size, rng)
+    placed = [
+        (board_.to_relative(row, column), tile_)
+        for (row, column), tile_ in board_.items()
+    ]
+
+    def run():
+        for coords, tile_ in placed:
+            board_.is_path_closed(coords, tile_)
+
+    return run, size
+
+
+def bench_possible_moves(size, rng, directory, array_mode=False):
+    """
+    Generate `NUM_QUERIES` times the moves of a tile on a board of `size`
+    tiles, each time for another tile of the default deck.
+    """
+    board_ = _filled_board(size, rng, array_mode)
+    tiles = _tiles(NUM_QUERIES, rng)
+
+    def run():
+        for tile_ in tiles:
+            board_.generate_possible_moves(tile_)
+
+    return run, NUM_QUERIES
+
+
+def bench_possible_moves_array(size, rng, directory):
+    """
+    Same as `bench_possible_moves`, on a board in array mode.
+    """
+    return bench_possible_moves(size, rng, directory, array_mode=True)
+
+
+def bench_rotate_clockwise(size, rng, directory):
+    """
+    Rotate `size` (non-shared) tiles clockwise.
+    """
+    tiles = [
+        tile.Tile.from_type(tile_.tile_type, tile_.rotation)
+        for tile_ in _tiles(size, rng)
+    ]
+
+    def run():
+        for tile_ in tiles:
+            tile_.rotate_clockwise()
+
+    return run, size
+
+
+def bench_load_tiles(size, rng, directory):
+    """
+    Load, by parsing its text, a deck file of `size` tiles.
+    """
+    path = _deck_file(directory, size)
+
+    def run():
+        deck.load_tiles(path, use_cache=False)
+
+    return run, size
+
+
+def bench_load_tiles_cached(size, rng, directory):
+    """
+    Load, from its compiled form, a deck file of `size` tiles.
+    """
+    path = _deck_file(directory, size)
+    deck.load_tiles(path)
+
+    def run():
+        # only the compiled file is kept from one run to the other
+        deck.clear_cache()
+        deck.load_tiles(path)
+
+    return run, size
+
+
+def bench_display(size, rng, directory):
+    """
+    Display a board of `size` tiles into memory.
+    """
+    board_ = _filled_board(size, rng)
+
+    def run():
+        board_.display(io.StringIO())
+
+    return run, size
+
+
+def bench_game(size, rng, directory, lineup=DEFAULT_LINEUP):
+    """
+    Play silently a complete game with a deck of `size` tiles, the players
+    having enough pawns for the game to last until the deck is exhausted.
+    The number of operations is the number of moves.
+    """
+    path = _deck_file(directory, size)
+    specifications = simulation.parse_lineup(lineup)
+    seed = rng.getrandbits(64)
+
+    def run():
+        # each run plays the same game
+        return simulation.play_game(
+            specifications, path, seed=seed, num_pawns=size
+        ).num_moves
+
+    return run, max(run(), 1)
+
+
+def _recorded_game(size, rng, directory, lineup=DEFAULT_LINEUP):
+    """
+    Return the `record.GameRecord` of a game played as in `bench_game`.
+    """
+    return simulation.play_game(
+        simulation.parse_lineup(lineup),
+        _deck_file(directory, size),
+        seed=rng.getrandbits(64),
+        num_pawns=size,
+        recorded=True,
+    ).game_record
+
+
+def bench_replay(size, rng, directory):
+    """
+    Replay the record of a game with a deck of `size` tiles (see
+    `record.replay`). The number of operations is the number of moves.
+    """
+    game_record = _recorded_game(size, rng, directory)
+
+    def run():
+        record.replay(game_record)
+
+    return run, max(game_record.num_moves, 1)
+
+
+def bench_replay_apply_move(size, rng, directory):
+    """
+    Replay the record of a game with a deck of `size` tiles through
+    `Game.apply_move`, which checks and publishes each move.
+    """
+    game_record = _recorded_game(size, rng, directory)
+
+    def run():
+        game_state = record.replay(game_record, 0)
+        for row, column, rotation in game_record.moves:
+            game_state.apply_move(
+                board.Move(game_state.board.to_relative(row, column), rotation)
+            )
+
+    return run, max(game_record.num_moves, 1)
+
+
+# The benchmarks, along with their default sizes.
+BENCHMARKS = {
+    "board_setitem": (bench_board_setitem, (100, 1000, 10000, 30000)),
+    "adjacent_positions": (bench_adjacent_positions, (100, 1000, 10000, 30000)),
+    "is_path_closed": (bench_is_path_closed, (100, 1000, 10000, 30000)),
+    "possible_moves": (bench_possible_moves, (100, 1000, 10000, 30000)),
+    "possible_moves_array": (bench_possible_moves_array, (100, 1000, 10000, 30000)),
+    "rotate_clockwise": (bench_rotate_clockwise, (1000, 10000, 100000)),
+    "load_tiles": (bench_load_tiles, (36, 10000, 300000)),
+    "load_tiles_cached": (bench_load_tiles_cached, (36, 10000, 300000)),
+    "display": (bench_display, (100, 1000, 10000)),
+    "game": (bench_game, (36, 180, 720)),
+    "replay": (bench_replay, (36, 180, 720)),
+    "replay_apply_move": (bench_replay_apply_move, (36, 180, 720)),
+}
+
+
+def measure(name, size, repeat=3, seed=0, directory=None):
+    """
+    Run the benchmark `name` (see `BENCHMARKS`) at the passed size `repeat`
+    times, and return its `Measurement`. The data of the benchmark are drawn
+    from a random generator seeded with `seed`, and its files are written
+    into `directory` (by default, a temporary directory).
+    """
+    assert repeat > 0, "invalid repeat"
+    if directory is None:
+        with tempfile.TemporaryDirectory() as directory:
+            return measure(name, size, repeat, seed, directory)
+    function, _ = BENCHMARKS[name]
+    run, operations = function(size, random.Random(seed), directory)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return Measurement(
+        name, size, operations, repeat, min(times), statistics.median(times)
+    )
+
+
+def run_suite(names=None, sizes=None, max_size=None, repeat=3, seed=0):
+    """
+    Run the passed benchmarks (by default, all of them) at the passed sizes
+    (by default, their own sizes, up to `max_size` if any), and return the
+    list of their `Measurement`, in order.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name in names or BENCHMARKS:
+            for size in sizes or BENCHMARKS[name][1]:
+                if max_size is None or size <= max_size:
+                    results.append(measure(name, size, repeat, seed, directory))
+    return results
+
+
+def scaling_exponents(results):
+    """
+    Return, for each measurement, the exponent `k` such that the time per
+    run grows as `size ** k` since the previous size of the same benchmark
+    (`None` for the first size).
+    """
+    exponents = []
+    previous = {}
+    for result in results:
+        last = previous.get(result.name)
+        if last is None or last.size == result.size or last.best <= 0:
+            exponents.append(None)
+        else:
+            exponents.append(
+                math.log(result.best / last.best) / math.log(result.size / last.size)
+            )
+        previous[result.name] = result
+    return exponents
+
+
+def to_json(results):
+    """
+    Return the JSON-serializable form of the passed results, along with the
+    environment they were measured in.
+    """
+    entries = []
+    for result, exponent in zip(results, scaling_exponents(results)):
+        entry = result.to_json()
+        entry["exponent"] = exponent
+        entries.append(entry)
+    return {
+        "version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": entries,
+    }
+
+
+def load_results(path):
+    """
+    Return the dictionary mapping `(name, size)` couples to the per-operation
+    times of the results stored at `path` (see `to_json`). Raises `IOError` if
+    any i/o error happens, and `ValueError` if the file is not valid.
+    """
+    with open(path) as file:
+        data = json.load(file)
+    if data.get("version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported version ({data.get('version')})")
+    return {
+        (entry["name"], entry["size"]): entry["per_operation"]
+        for entry in data["results"]
+    }
+
+
+@dataclasses.dataclass(frozen=True)
+class Comparison:
+    """
+    The comparison of a measurement with its baseline, as the ratio of their
+    per-operation times (above 1 when slower than the baseline).
+    """
+
+    measurement: Measurement
+    baseline: float
+
+    @property
+    def ratio(self):
+        return self.measurement.per_operation / self.baseline
+
+    def is_regression(self, tolerance):
+        return self.ratio > 1 + tolerance
+
+
+def compare(results, baseline):
+    """
+    Return the list of `Comparison` of the passed results with the baseline
+    (see `load_results`), for the measurements having a baseline.
+    """
+    return [
+        Comparison(result, baseline[result.name, result.size])
+        for result in results
+        if baseline.get((result.name, result.size), 0) > 0
+    ]
+
+
+def report(results, comparisons=(), tolerance=0.25):
+    """
+    Return a human-readable table of the results and of their comparison with
+    the baseline, as a string.
+    """
+    ratios = {
+        (comparison.measurement.name, comparison.measurement.size): comparison
+        for comparison in comparisons
+    }
+    lines = [
+        f"{'benchmark':<20}{'size':>9}{'best (s)':>12}{'per op (us)':>14}"
+        f"{'exponent':>10}{'vs baseline':>13}"
+    ]
+    for result, exponent in zip(results, scaling_exponents(results)):
+        comparison = ratios.get((result.name, result.size))
+        if comparison is None:
+            versus = "-"
+        else:
+            versus = f"{comparison.ratio:.2f}x"
+            if comparison.is_regression(tolerance):
+                versus += " !"
+        lines.append(
+            f"{result.name:<20}{result.size:>9}{result.best:>12.4f}"
+            f"{result.per_operation * 1e6:>14.3f}"
+            f"{'-' if exponent is None else format(exponent, '.2f'):>10}"
+            f"{versus:>13}"
+        )
+    return "\n".join(lines)
+
+
+@dataclasses.dataclass(frozen=True)
+class MemoryUsage:
+    """
+    The memory allocated to build `count` objects of a kind, in bytes: kept
+    once built (`retained`), and at most while building them (`peak`), along
+    with the number of distinct objects among them.
+    """
+
+    name: str
+    count: int
+    retained: int
+    peak: int
+    distinct: int
+
+    @property
+    def per_object(self):
+        return self.retained / self.count
+
+
+def _memory_usage(name, build):
+    """
+    Call `build`, which returns a list of objects, and return the
+    `MemoryUsage` of the list.
+    """
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        objects = build()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return MemoryUsage(
+        name,
+        len(objects),
+        current - start,
+        peak - start,
+        len({id(object_) for object_ in objects}),
+    )
+
+
+def measure_memory(size=1_000_000, seed=0, directory=None):
+    """
+    Return the list of `MemoryUsage` of a deck of `size` tiles loaded from a
+    file, of `size` tiles of the default deck, and of `size // 10` coordinates
+    (small enough for their integers to be shared) and random players.
+    """
+    if directory is None:
+        with tempfile.TemporaryDirectory() as directory:
+            return measure_memory(size, seed, directory)
+    rng = random.Random(seed)
+    path = _deck_file(directory, size)
+    default_tiles = deck.make_tiles()
+    return [
+        _memory_usage("load_tiles", lambda: deck.load_tiles(path, use_cache=False)),
+        _memory_usage(
+            "make_tiles",
+            lambda: [
+                tile_
+                for _ in range(size // len(default_tiles))
+                for tile_ in deck.make_tiles()
+            ],
+        ),
+        _memory_usage(
+            "coords",
+            lambda: [
+                utils.Coords(rng.randrange(-128, 128), rng.randrange(-128, 128))
+                for _ in range(size // 10)
+            ],
+        ),
+        _memory_usage(
+            "random_player",
+            lambda: [
+                player.RandomPlayer(player.Color.BLUE, 10) for _ in range(size // 10)
+            ],
+        ),
+    ]
+
+
+def memory_report(usages):
+    """
+    Return a human-readable table of the passed `MemoryUsage`, as a string.
+    """
+    lines = [
+        f"{'objects':<16}{'count':>10}{'retained (MiB)':>16}{'peak (MiB)':>12}"
+        f"{'bytes each':>12}{'distinct':>10}"
+    ]
+    for usage in usages:
+        lines.append(
+            f"{usage.name:<16}{usage.count:>10}{usage.retained / 2**20:>16.1f}"
+            f"{usage.peak / 2**20:>12.1f}{usage.per_object:>12.1f}"
+            f"{usage.distinct:>10}"
+        )
+    return "\n".join(lines)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="My First Carcassonne benchmarks")
+    parser.add_argument(
+        "names",
+        nargs="*",
+        metavar="name",
+        help=f"benchmarks to run (default: all, i.e. {', '.join(BENCHMARKS)})",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda text: [int(size) for size in text.split(",")],
+        help="comma-separated sizes (default: the sizes of each benchmark)",
+    )
+    parser.add_argument("--max-size", type=int, help="skip the sizes above this one")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the data")
+    parser.add_argument(
+        "--output", metavar="PATH", help="write the results as JSON ('-': stdout)"
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="PATH",
+        default=DEFAULT_BASELINE,
+        help="results to compare with (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store the results as the new baseline",
+    )
+    parser.add_argument(
+        "--memory",
+        type=int,
+        nargs="?",
+        const=1_000_000,
+        metavar="SIZE",
+        help="report the memory used by SIZE tiles (default: 1000000) instead "
+        "of timing the benchmarks",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="slowdown reported as a regression (default: %(default)s)",
+    )
+    arguments = parser.parse_args()
+    for name in arguments.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark ({name})")
+    return arguments
+
+
+def main():
+    arguments = parse_arguments()
+    if arguments.memory is not None:
+        print(memory_report(measure_memory(arguments.memory, arguments.seed)))
+        return 0
+    results = run_suite(
+        arguments.names,
+        arguments.sizes,
+        arguments.max_size,
+        arguments.repeat,
+        arguments.seed,
+    )
+    comparisons = []
+    if not arguments.save_baseline and os.path.exists(arguments.baseline):
+        try:
+            comparisons = compare(results, load_results(arguments.baseline))
+        except (IOError, ValueError, KeyError) as error:
+            print("*** baseline error", error, file=sys.stderr)
+    print(report(results, comparisons, arguments.tolerance), file=sys.stderr)
+    if arguments.output == "-":
+        json.dump(to_json(results), sys.stdout, indent=2)
+        print()
+    elif arguments.output is not None:
+        with open(arguments.output, "w") as file:
+            json.dump(to_json(results), file, indent=2)
+    if arguments.save_baseline:
+        with open(arguments.baseline, "w") as file:
+            json.dump(to_json(results), file, indent=2)
+    regressions = [
+        comparison
+        for comparison in comparisons
+        if comparison.is_regression(arguments.tolerance)
+    ]
+    return 1 if regressions else 0
+
+
+# Entry point of the benchmarks
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,19 @@
+import array_board
+import collections.abc
 import dataclasses
-import enum
 import player
-import utils
-
-from dataclasses import dataclass, field
-from typing import List, Optional, FrozenSet, Dict
-from tile import Side, Tile
+import profiling
+import roads
+import sys
+import tile
+import zobrist
+
+from typing import List, Optional, Dict, NamedTuple
+from tile import NUM_ROTATIONS, SIDE_DELTAS, Side, Tile
 from utils import Coords
 
 
-
-
-@dataclass
-class Move:
+class Move(NamedTuple):
     position: Coords  # Position où placer la tuile
     rotation: int  # Rotation de la tuile (0°, 90°, 180°, 270°)
 
@@ -46,20 +47,113 @@ class BoardException(Exception):
 EMPTY_SPACE = "."
 
 
+@dataclasses.dataclass(frozen=True)
+class Viewport:
+    """
+    A rectangle of cells to render, given by the absolute coordinates of its
+    top left and bottom right cells (both included); it may extend beyond the
+    placed tiles.
+    """
+
+    min_row: int
+    min_column: int
+    max_row: int
+    max_column: int
+
+    @property
+    def height(self):
+        return self.max_row - self.min_row + 1
+
+    @property
+    def width(self):
+        return self.max_column - self.min_column + 1
+
+
+# The `(row, column)` offsets to the neighbouring cells, and the index of the
+# facing side on the neighbouring tile, in the order of `tile.SIDES`.
+NEIGHBOUR_DELTAS = tuple(SIDE_DELTAS[side] for side in tile.SIDES)
+FACING_SIDE_INDICES = (2, 3, 0, 1)
+
+
+def tile_zobrist_key(row, column, tile):
+    """
+    Return the Zobrist key of `tile` placed at the passed absolute coordinates;
+    rotations giving the same tile give the same key.
+    """
+    return zobrist.cell_key(
+        row, column, tile.type_id, tile.tile_type.canonical_rotation(tile.rotation)
+    )
+
+
+class FrontierView(collections.abc.Set):
+    """
+    Read-only, live view of the frontier of a board, i.e. the empty cells
+    sharing a side with at least one placed tile. Iterating the view yields
+    `Coords` relative to the current extent of the board; it costs nothing to
+    create, and its size is the size of the frontier.
+    """
+
+    def __init__(self, board):
+        self._board = board
+
+    def __len__(self):
+        return len(self._board._frontier)
+
+    def __iter__(self):
+        to_relative = self._board.to_relative
+        for row, column in self._board._frontier:
+            yield to_relative(row, column)
+
+    def __contains__(self, coords):
+        return self._board.to_absolute(coords) in self._board._frontier
+
+
 class Board:
     """
-    Board, as an extensible rectangle of tiles, represented as a list of list
-    of `Tile` instances; `None` is used to indicate a given cell is empty.
+    Board, as an extensible rectangle of tiles. The tiles are stored sparsely,
+    in a dictionary whose keys are the absolute `(row, column)` coordinates of
+    the cells holding a tile; absolute coordinates never change once a tile is
+    placed, and the bounding box of placed tiles is maintained incrementally.
+
+    The public `Coords`-based interface (`__getitem__`, `__setitem__`,
+    `height`, `width`, `display`) exposes the bounding box surrounded by a
+    one-cell margin of empty cells, with `Coords(row=0, column=0)` being its top
+    left corner; the translation between both coordinate systems is done by
+    `to_absolute` and `to_relative`.
+
+    The frontier (the empty cells where a tile may be played) and the road
+    network (see `roads.RoadNetwork`) are maintained as tiles are placed, so
+    that neither the playable cells nor the closed roads ever have to be
+    recomputed from the grid.
+
+    In array mode, the side colors of the tiles are also stored in an
+    `array_board.ArrayBoard`, which move generation then uses to check the
+    compatibility of all the placements of a cell at once.
     """
 
-    def __init__(self):
+    def __init__(self, array_mode=False):
         """
-        Create a 1x1 board, whose only cell is empty (this set to `None`).
+        Create a 1x1 board, whose only cell is empty, in array mode if
+        `array_mode` is true.
         """
+        self._cells = {}
+        self._array = array_board.ArrayBoard() if array_mode else None
+        self._frontier = set()
+        self._roads = roads.RoadNetwork(self._cells)
+        self._last_closed_roads = []
+        self._history = []
+        self._hash = 0
+        self._min_row = 0
+        self._max_row = 0
+        self._min_column = 0
+        self._max_column = 0
+        # absolute coordinates of `Coords(row=0, column=0)`
+        self._row_offset = 0
+        self._column_offset = 0
         self._height = 1
         self._width = 1
-        self._tiles = [[None]]
         self._players: Dict[str, player.Player] = {}  # Dictionnaire des joueurs avec leur couleur
+        self._profiler = None
 
 
     @property
@@ -70,6 +164,190 @@ class Board:
     def width(self):
         return self._width
 
+    @property
+    def num_tiles(self):
+        return len(self._cells)
+
+    @property
+    def array(self):
+        """
+        Return the `array_board.ArrayBoard` mirroring the tiles in array mode,
+        or `None`.
+        """
+        return self._array
+
+    @property
+    def profiler(self):
+        """
+        The `profiling.Profiler` counting the placements and closure checks of
+        the board (usually the one of its game), or `None`.
+        """
+        return self._profiler
+
+    @profiler.setter
+    def profiler(self, value):
+        self._profiler = value
+
+    @property
+    def frontier(self):
+        """
+        Return a read-only view (see `FrontierView`) of the empty cells adjacent
+        to a placed tile.
+        """
+        return FrontierView(self)
+
+    @property
+    def zobrist_hash(self):
+        """
+        Return the exclusive or of the `zobrist.cell_key` of all placed tiles,
+        maintained as tiles are placed.
+        """
+        return self._hash
+
+    @property
+    def last_closed_roads(self):
+        """
+        Return the list of `roads.ClosedRoad` closed by the last placement.
+        """
+        return self._last_closed_roads
+
+    @property
+    def bounding_box(self):
+        """
+        Return the absolute `(min_row, min_column, max_row, max_column)`
+        coordinates of the placed tiles, or `None` if the board is empty.
+        """
+        if not self._cells:
+            return None
+        return self._min_row, self._min_column, self._max_row, self._max_column
+
+    def to_absolute(self, coords):
+        """
+        Return the absolute `(row, column)` coordinates of the passed `Coords`.
+        """
+        return coords.row + self._row_offset, coords.column + self._column_offset
+
+    def to_relative(self, row, column):
+        """
+        Return the `Coords` matching the passed absolute coordinates.
+        """
+        return Coords(row=row - self._row_offset, column=column - self._column_offset)
+
+    def tile_at(self, row, column):
+        """
+        Return the tile at the passed absolute coordinates, or `None` if the
+        cell is empty. Any couple of integers is valid.
+        """
+        return self._cells.get((row, column))
+
+    def items(self):
+        """
+        Return an iterable over the `((row, column), tile)` couples of the
+        placed tiles, using absolute coordinates.
+        """
+        return self._cells.items()
+
+    @profiling.profiled("Board.place_at")
+    def place_at(self, row, column, tile):
+        """
+        Place `tile` at the passed absolute coordinates, in constant time.
+        Raises `BoardException` if there is already a tile in the cell.
+
+        The frontier loses the cell and gains its empty neighbours, and the
+        links of the tile are added to the road network. Returns the list of
+        `roads.ClosedRoad` closed by the placement. The placement is recorded,
+        so that it can be reverted by `undo_placement`.
+        """
+        key = (row, column)
+        if key in self._cells:
+            raise BoardException("tile already set", self.to_relative(row, column))
+        bounding_box = (
+            self._min_row,
+            self._max_row,
+            self._min_column,
+            self._max_column,
+        )
+        if self._cells:
+            if row < self._min_row:
+                self._min_row = row
+            elif row > self._max_row:
+                self._max_row = row
+            if column < self._min_column:
+                self._min_column = column
+            elif column > self._max_column:
+                self._max_column = column
+        else:
+            self._min_row = self._max_row = row
+            self._min_column = self._max_column = column
+        self._cells[key] = tile
+        frontier = self._frontier
+        was_frontier = key in frontier
+        frontier.discard(key)
+        added = []
+        for delta_row, delta_column in SIDE_DELTAS.values():
+            neighbour = (row + delta_row, column + delta_column)
+            if neighbour not in self._cells and neighbour not in frontier:
+                frontier.add(neighbour)
+                added.append(neighbour)
+        self._update_extent()
+        self._history.append(
+            (
+                key,
+                bounding_box,
+                was_frontier,
+                added,
+                self._roads.checkpoint(),
+                self._last_closed_roads,
+            )
+        )
+        self._hash ^= tile_zobrist_key(row, column, tile)
+        if self._array is not None:
+            self._array.place_at(row, column, tile)
+        self._last_closed_roads = self._roads.add_tile(row, column, tile)
+        return self._last_closed_roads
+
+    def undo_placement(self):
+        """
+        Revert the last placement not reverted yet, restoring the cells, the
+        extent, the frontier and the roads of the board exactly, and return
+        the removed tile.
+        """
+        assert self._history, "no placement to undo"
+        (
+            key,
+            bounding_box,
+            was_frontier,
+            added,
+            mark,
+            self._last_closed_roads,
+        ) = self._history.pop()
+        self._roads.rollback(mark)
+        removed = self._cells.pop(key)
+        self._hash ^= tile_zobrist_key(*key, removed)
+        if self._array is not None:
+            self._array.remove_at(*key)
+        frontier = self._frontier
+        frontier.difference_update(added)
+        if was_frontier:
+            frontier.add(key)
+        self._min_row, self._max_row, self._min_column, self._max_column = bounding_box
+        self._update_extent()
+        return removed
+
+    def _update_extent(self):
+        """
+        Compute the offsets and dimensions of the `Coords`-based view from the
+        bounding box.
+        """
+        if self._cells:
+            self._row_offset = self._min_row - 1
+            self._column_offset = self._min_column - 1
+            self._height = self._max_row - self._min_row + 3
+            self._width = self._max_column - self._min_column + 3
+        else:
+            self._row_offset = self._column_offset = 0
+            self._height = self._width = 1
+
     def _check_coords(self, coords):
         """
         Raise `BoardException` if the passed coordinates are invalid, doing notheing
@@ -84,7 +362,7 @@ class Board:
         if the coordinates are invalid.
         """
         self._check_coords(key)
-        return self._tiles[key.row][key.column]
+        return self._cells.get(self.to_absolute(key))
 
     def __setitem__(self, key, value):
         """
@@ -93,49 +371,82 @@ class Board:
         coordinates.
 
         Ensures there is always room to place a tile next to all tiles in the
-        board by automatically adding rows and columns as necessary. As a
-        consequence, the coordinates of already-placed tiles may be changed.
+        board, as the margin around the bounding box grows with it. As a
+        consequence, the `Coords` of already-placed tiles may be changed (their
+        absolute coordinates never are).
         """
         self._check_coords(key)
-        if self._tiles[key.row][key.column] is None:
-            self._tiles[key.row][key.column] = value
-            if key.row == self._height - 1:
-                self._tiles.append([None] * self._width)
-                self._height += 1
-            if key.row == 0:
-                self._tiles.insert(0, [None] * self._width)
-                self._height += 1
-            if key.column == self._width - 1:
-                for row_tiles in self._tiles:
-                    row_tiles.append(None)
-                self._width += 1
-            if key.column == 0:
-                for row_tiles in self._tiles:
-                    row_tiles.insert(0, None)
-                self._width += 1
-        else:
-            raise BoardException("tile already set", key)
+        self.place_at(*self.to_absolute(key), value)
 
-    def display(self):
+    def viewport(self, margin=1):
         """
-        Print the board onto the standard output.
+        Return the `Viewport` made of the bounding box of the placed tiles
+        surrounded by `margin` cells (by default, the whole `Coords`-based
+        view of the board).
         """
-        chars = utils.make_2d_chars(
-            height=self._height * tile.TILE_HEIGHT,
-            width=self._width * tile.TILE_WIDTH,
-            value=EMPTY_SPACE,
+        if not self._cells:
+            return Viewport(-margin, -margin, margin, margin)
+        return Viewport(
+            self._min_row - margin,
+            self._min_column - margin,
+            self._max_row + margin,
+            self._max_column + margin,
         )
-        for row in range(self._height):
-            for column in range(self._width):
-                coords = Coords(row=row, column=column)
-                cell = self[coords]
-                if cell is not None:
-                    cell.display_in_chars(
-                        chars,
-                        start_row=row * tile.TILE_HEIGHT,
-                        start_column=column * tile.TILE_WIDTH,
-                    )
-        print("\n".join(map(lambda x: "".join(x), chars)))
+
+    def window(self, top_left, height, width):
+        """
+        Return the `Viewport` of `height` rows and `width` columns of cells
+        whose top left corner is at the passed `Coords`.
+        """
+        assert height > 0, "invalid height"
+        assert width > 0, "invalid width"
+        row, column = self.to_absolute(top_left)
+        return Viewport(row, column, row + height - 1, column + width - 1)
+
+    def render_lines(self, viewport=None):
+        """
+        Generate the lines of the representation of the cells of `viewport`
+        (by default, `viewport()`), each line having
+        `viewport.width * TILE_WIDTH` characters. The lines are built one row
+        of cells at a time from the cached glyphs of the tiles (see
+        `tile.Tile.glyph`), so that the cost is proportional to the size of
+        the viewport, and the memory to the size of one row.
+        """
+        if viewport is None:
+            viewport = self.viewport()
+        empty_cell = EMPTY_SPACE * tile.TILE_WIDTH
+        empty_line = empty_cell * viewport.width
+        columns = range(viewport.min_column, viewport.max_column + 1)
+        cells = self._cells
+        for row in range(viewport.min_row, viewport.max_row + 1):
+            glyphs = [cells.get((row, column)) for column in columns]
+            if not any(glyphs):
+                for _ in range(tile.TILE_HEIGHT):
+                    yield empty_line
+                continue
+            glyphs = [None if cell is None else cell.glyph for cell in glyphs]
+            for line in range(tile.TILE_HEIGHT):
+                yield "".join(
+                    empty_cell if glyph is None else glyph[line] for glyph in glyphs
+                )
+
+    def render(self, viewport=None):
+        """
+        Return the representation of the cells of `viewport` (by default, the
+        whole board), as a string (see `render_lines`).
+        """
+        return "\n".join(self.render_lines(viewport))
+
+    def display(self, output=None, viewport=None):
+        """
+        Print the cells of `viewport` (by default, the whole board) onto
+        `output` (by default, the standard output), line by line.
+        """
+        if output is None:
+            output = sys.stdout
+        for line in self.render_lines(viewport):
+            output.write(line)
+            output.write("\n")
 
     def add_player(self, new_player: player.Player):
         """Ajoute un joueur à la partie."""
@@ -143,91 +454,154 @@ class Board:
 
     def get_adjacent_tile(self, coords: Coords, side: Side) -> Optional[Tile]:
         """Retourne la tuile adjacente dans la direction spécifiée."""
-        row, column = coords.row, coords.column
-        if side == Side.NORTH and row > 0:
-            return self[Coords(row - 1, column)]
-        elif side == Side.SOUTH and row < self._height - 1:
-            return self[Coords(row + 1, column)]
-        elif side == Side.WEST and column > 0:
-            return self[Coords(row, column - 1)]
-        elif side == Side.EAST and column < self._width - 1:
-            return self[Coords(row, column + 1)]
-        return None
-    
+        row, column = self.to_absolute(coords)
+        delta_row, delta_column = SIDE_DELTAS[side]
+        return self._cells.get((row + delta_row, column + delta_column))
+
     def get_adjacent_positions(self) -> List[Coords]:
         """
         Retourne une liste de positions vides qui sont adjacentes à une tuile déjà placée.
         """
-        adjacent_positions = set()
-
-        # Parcourir toutes les tuiles placées et trouver les positions adjacentes
-        for row in range(self._height):
-            for col in range(self._width):
-                if self._tiles[row][col] is not None:  # Il y a une tuile ici
-                    # Vérifier les 4 directions autour
-                    for delta_row, delta_col in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                        adj_row = row + delta_row
-                        adj_col = col + delta_col
-                        if 0 <= adj_row < self._height and 0 <= adj_col < self._width:
-                            if self._tiles[adj_row][adj_col] is None:  # Position vide adjacente
-                                new_coords = Coords(adj_row, adj_col)
-                                print(f"Adding Coords to set: {new_coords.row}, {new_coords.column}")
-                                adjacent_positions.add(new_coords)
-
-        return list(adjacent_positions)
-    
+        return list(self.frontier)
+
+    @profiling.profiled("Board.is_path_closed")
     def is_path_closed(self, coords: Coords, tile: Tile) -> bool:
-        """Détermine si un chemin est clos."""
-        closed_paths = True
-        print(f"Vérification si le chemin est clos pour la tuile en {coords}")
-        for link in tile.links:
-            for side in link.sides:
-                adjacent_tile = self.get_adjacent_tile(coords, side)
-                if adjacent_tile:
-                    opposite_side = {
-                        Side.NORTH: Side.SOUTH,
-                        Side.SOUTH: Side.NORTH,
-                        Side.EAST: Side.WEST,
-                        Side.WEST: Side.EAST,
-                    }[side]
-
-                    adjacent_link = adjacent_tile.get_link(opposite_side)
-                    if not adjacent_link or adjacent_link.color != link.color:
-                        closed_paths = False
-                else:
-                    closed_paths = False
-        print(f"Chemin clos : {closed_paths}")
-        return closed_paths
+        """
+        Détermine si un chemin passant par `tile`, posée en `coords`, est clos.
+        """
+        row, column = self.to_absolute(coords)
+        return any(
+            self._roads.is_closed((row, column, next(iter(link.sides))))
+            for link in tile.links
+        )
+
+    @profiling.profiled("Board.award_pawns")
+    def award_pawns(self):
+        """
+        Place les pions des chemins clos par la dernière pose de tuile : pour
+        chaque chemin clos, le joueur de la couleur du chemin place un pion par
+        lien du chemin, tant qu'il lui en reste. Retourne la liste des couples
+        (joueur, nombre de pions placés), avec au plus un couple par joueur.
+        """
+        awarded = {}
+        for road in self._last_closed_roads:
+            player_instance = self._players.get(road.color)
+            if player_instance is None:
+                continue
+            num_pawns = min(road.num_links, player_instance.num_pawns)
+            if num_pawns > 0:
+                player_instance.num_pawns -= num_pawns
+                awarded[player_instance] = awarded.get(player_instance, 0) + num_pawns
+        return list(awarded.items())
 
     def place_pawn_if_path_closed(self, coords: Coords, tile: Tile):
-        """Place des pions si un chemin est clos après la pose d'une tuile."""
-        if self.is_path_closed(coords, tile):
-            for link in tile.links:
-                player_instance = self._players.get(link.color)
-                if player_instance and player_instance.num_pawns > 0:
-                    print(f"Placing a pawn for player {player_instance.color} on a closed path.")
-                    player_instance.num_pawns -= 1
-                    print(f"Pions restants pour {player_instance.color}: {player_instance.num_pawns}")
-                else:
-                    print(f"Player {player_instance.color} has no pawns left.")
+        """
+        Place des pions pour les chemins clos par la dernière pose de tuile
+        (`tile`, en `coords`), voir `award_pawns`, dont le résultat est retourné.
+        """
+        return self.award_pawns()
+
+    def generate_possible_moves(self, tile: Tile) -> List[Move]:
+        """
+        Génère les coups possibles pour la tuile piochée `tile` : pour chaque
+        position de la frontière, une rotation (relative à l'orientation
+        actuelle de la tuile) par tuile différente obtenue en la tournant, ce
+        qui écarte les rotations équivalentes d'une tuile symétrique.
+
+        Les poses où un lien rencontre, sur une tuile voisine, un lien d'une
+        autre couleur sont écartées ; si aucune pose n'est compatible avec ses
+        voisines, toutes les poses sont proposées.
+        """
+        tile_type = tile.tile_type
+        rotations = [
+            ((tile.rotation + quarter_turns) % NUM_ROTATIONS, quarter_turns * 90)
+            for quarter_turns in range(len(tile_type.unique_rotations))
+        ]
+        if self._array is not None:
+            possible_moves = self._generate_compatible_moves_from_array(
+                tile_type, rotations
+            )
         else:
-            print(f"Chemin non clos, aucun pion placé pour {tile}.")
+            possible_moves = self._generate_compatible_moves(tile_type, rotations)
+        if not possible_moves:
+            possible_moves = [
+                Move(position=self.to_relative(row, column), rotation=degrees)
+                for row, column in self._frontier
+                for _, degrees in rotations
+            ]
+        return possible_moves
+
+    def _generate_compatible_moves(self, tile_type, rotations):
+        """
+        Return the moves placing a tile of type `tile_type` with one of the
+        `(rotation, degrees)` couples of `rotations` compatibly with its
+        neighbours.
+        """
+        cells = self._cells
+        possible_moves = []
+        for row, column in self._frontier:
+            neighbour_colors = []
+            for (delta_row, delta_column), facing in zip(
+                NEIGHBOUR_DELTAS, FACING_SIDE_INDICES
+            ):
+                neighbour = cells.get((row + delta_row, column + delta_column))
+                neighbour_colors.append(
+                    None if neighbour is None else neighbour.side_colors[facing]
+                )
+            position = None
+            for rotation, degrees in rotations:
+                if all(
+                    color is None or other is None or color == other
+                    for color, other in zip(
+                        tile_type.side_colors(rotation), neighbour_colors
+                    )
+                ):
+                    if position is None:
+                        position = self.to_relative(row, column)
+                    possible_moves.append(Move(position=position, rotation=degrees))
+        return possible_moves
+
+    def _generate_compatible_moves_from_array(self, tile_type, rotations):
+        """
+        Same as `_generate_compatible_moves`, with the compatibility of all
+        the placements computed at once from the array mirror. The moves are
+        listed in the same order.
+        """
+        frontier = list(self._frontier)
+        if not frontier:
+            return []
+        rows, columns = zip(*frontier)
+        compatible = self._array.compatibility(
+            rows, columns, tile_type, [rotation for rotation, _ in rotations]
+        )
+        to_relative = self.to_relative
+        possible_moves = []
+        for (row, column), cell_compatible in zip(frontier, compatible.tolist()):
+            if any(cell_compatible):
+                position = to_relative(row, column)
+                for (_, degrees), ok in zip(rotations, cell_compatible):
+                    if ok:
+                        possible_moves.append(Move(position=position, rotation=degrees))
+        return possible_moves
+
+    def rotate_tile(self, tile: Tile, rotation: int) -> Tile:
+        """
+        Retourne la tuile (partagée, voir `tile.Tile.rotated`) obtenue en tournant
+        `tile` de la rotation spécifiée (0, 90, 180, 270 degrés).
+        """
+        return tile.rotated(rotation // 90)
 
-    
     def place_tile_with_rotation(self, coords, tile, rotation):
         """
         Place une tuile à une position donnée avec une rotation spécifique sur le plateau.
         :param coords: Les coordonnées où placer la tuile (objet `Coords`).
-        :param tile: La tuile à placer.
+        :param tile: La tuile à placer, qui n'est pas modifiée (les tuiles du
+            deck sont partagées, voir `tile.Tile.intern`).
         :param rotation: La rotation à appliquer à la tuile (0, 90, 180, 270 degrés).
         """
-        # Appliquer la rotation à la tuile
-        for _ in range(rotation // 90):
-            tile.rotate_clockwise()
-
         # Vérifier si la position est valide et disponible
-        if self._tiles[coords.row][coords.column] is not None:
+        if self[coords] is not None:
             raise ValueError(f"La position {coords} est déjà occupée.")
 
-        # Placer la tuile sur le plateau
-        self._tiles[coords.row][coords.column] = tile
\ No newline at end of file
+        # Placer la tuile tournée sur le plateau (qui s'agrandit si nécessaire)
+        self[coords] = self.rotate_tile(tile, rotation)
@@ -1,4 +1,10 @@
+import array
+import collections
+import hashlib
+import os
 import player
+import struct
+import sys
 import tile
 
 
@@ -27,22 +33,28 @@ The specification of the format for such files is as follows:
 - a link specification has the following form: *side* `-` *side* `:` *color*,
   where the possible values for the sides are `north`, `east`, `south`, `west`,
   and the possible values for the color are `blue`, `purple`, `red`, `yellow`.
+
+As parsing a large deck file is slow, `load_tiles` keeps a compiled (binary)
+form of each deck it parses, in a `CACHE_DIRECTORY` next to the file, named
+after the hash of the content of the file: a changed file thus gets a new
+compiled form, and the compiled form is read in a single read.
 """
 
 
 def tile_no_links():
     """
-    Create a tile with no links.
+    Return the (shared) tile with no links.
     """
-    return tile.Tile(links=[])
+    return tile.Tile.intern(links=[])
 
 
 def tile_one_link(sides, color):
     """
-    Create a tile with one link whose sides are passed as a tuple, and a player color.
+    Return the (shared) tile with one link whose sides are passed as a tuple,
+    and a player color.
     """
     assert len(sides) == 2 and sides[0] != sides[1], "invalid sides"
-    return tile.Tile(
+    return tile.Tile.intern(
         links=[
             tile.Link(
                 sides=frozenset(sides),
@@ -59,13 +71,14 @@ def tile_two_links(
     color2,
 ):
     """
-    Create a tile with two links whose sides are passed as tuples, and player colors.
+    Return the (shared) tile with two links whose sides are passed as tuples,
+    and player colors.
     """
     assert len(sides1) == 2 and sides1[0] != sides1[1], "invalid sides1"
     assert len(sides2) == 2 and sides2[0] != sides2[1], "invalid sides2"
     assert len(set(sides1 + sides2)) == 4
     assert color1 != color2, "invalid colors"
-    return tile.Tile(
+    return tile.Tile.intern(
         links=[
             tile.Link(
                 sides=frozenset(sides1),
@@ -109,6 +122,8 @@ def tile_consecutives(color1, color2):
 def make_tiles():
     """
     Return the list of all the tiles part of the game, i.e. the default deck.
+    As all the tiles, they are backed by the types of `tile.CATALOGUE`, and
+    identical tiles are a single shared instance (see `tile.Tile.intern`).
     """
     return (
         [
@@ -140,6 +155,113 @@ def make_tiles():
     )
 
 
+class Deck:
+    """
+    The tiles not drawn yet, as a multiset: the tiles are kept in no
+    particular order, along with the number of remaining tiles of each tile
+    type (see `counts`). A tile is drawn uniformly at random (hence each tile
+    type with a probability proportional to its count) in constant time, by
+    swapping it with the last tile; the swap is recorded, so that the draw can
+    be undone in constant time too, restoring the exact same order.
+    """
+
+    __slots__ = ("_tiles", "_counts", "_draws")
+
+    def __init__(self, tiles):
+        self._tiles = list(tiles)
+        self._counts = collections.Counter(tile_.type_id for tile_ in self._tiles)
+        self._draws = []
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def __iter__(self):
+        return iter(self._tiles)
+
+    @property
+    def counts(self):
+        """
+        The number of remaining tiles of each tile type, as a mapping from
+        type id to count (a type whose tiles have all been drawn keeps a count
+        of 0). Not to be modified.
+        """
+        return self._counts
+
+    def count(self, type_id):
+        return self._counts[type_id]
+
+    def draw(self, rng):
+        """
+        Remove a tile chosen with the random generator `rng` and return it.
+        """
+        tiles = self._tiles
+        assert tiles, "empty deck"
+        index = rng.randrange(len(tiles))
+        tiles[index], tiles[-1] = tiles[-1], tiles[index]
+        drawn = tiles.pop()
+        self._counts[drawn.type_id] -= 1
+        self._draws.append(index)
+        return drawn
+
+    def draw_type(self, type_id):
+        """
+        Remove a tile of the tile type whose id is passed (which must have a
+        nonzero count) and return it; the draw can be undone as any other.
+        Takes a time linear in the number of tiles, as the tile is searched
+        from the end of the deck.
+        """
+        tiles = self._tiles
+        index = len(tiles) - 1
+        while index >= 0 and tiles[index].type_id != type_id:
+            index -= 1
+        assert index >= 0, "no tile of that type"
+        tiles[index], tiles[-1] = tiles[-1], tiles[index]
+        drawn = tiles.pop()
+        self._counts[type_id] -= 1
+        self._draws.append(index)
+        return drawn
+
+    def undo_draw(self, drawn):
+        """
+        Put back the tile `drawn` returned by the last draw not undone yet.
+        """
+        index = self._draws.pop()
+        tiles = self._tiles
+        tiles.append(drawn)
+        tiles[index], tiles[-1] = tiles[-1], tiles[index]
+        self._counts[drawn.type_id] += 1
+
+    def copy(self):
+        """
+        Return an independent deck with the same remaining tiles (whose draws
+        cannot be undone).
+        """
+        result = Deck.__new__(Deck)
+        result._tiles = self._tiles[:]
+        result._counts = self._counts.copy()
+        result._draws = []
+        return result
+
+
+class InOrder:
+    """
+    A stand-in for a random generator, making `Deck.draw` draw the last tile
+    of the deck, so that the tiles are drawn in reverse order of the list
+    passed to the deck.
+    """
+
+    __slots__ = ()
+
+    def randrange(self, stop):
+        return stop - 1
+
+    def getstate(self):
+        return None
+
+    def setstate(self, state):
+        pass
+
+
 class InvalidFormat(Exception):
     """
     The exception to be raised if a file does not follow the deck specification.
@@ -258,19 +380,35 @@ def decode_line(line_num, text):
             raise InvalidFormat(line_num, f"unknown directive {items[0]}")
 
 
+def encode_line(tile_):
+    """
+    Encode the passed tile into a line following the format above (the
+    inverse of `decode_line`).
+    """
+    links = []
+    for link in tile_.links:
+        first_side, second_side = sorted(link.sides, key=tile.SIDE_INDEX.get)
+        links.append(f"{first_side.value}-{second_side.value}:{link.color.value}")
+    match links:
+        case []:
+            return "NO_LINKS"
+        case [link]:
+            return f"ONE_LINK {link}"
+        case _:
+            return f"TWO_LINKS {' & '.join(links)}"
+
+
 COMMENT_SIGN = "%"
 
 
-def load_tiles(path):
+def parse_tiles(text):
     """
-    Load the deck from the file whose path is passed. Raises `InvalidFormat` if
-    the file does not follow the specifiation above or contains no tiles, and
-    raises `IOError` if any i/o error happens.
+    Decode the content of a deck file (`str` value) into the list of its
+    tiles. Raises `InvalidFormat` if the text does not follow the
+    specification above or contains no tiles.
     """
-    with open(path, "r") as file:
-        lines = file.readlines()
     tiles = []
-    for line_num, line in enumerate(lines, start=1):
+    for line_num, line in enumerate(text.splitlines(), start=1):
         line_without_comment = line.split(COMMENT_SIGN)[0].strip()
         if len(line_without_comment) > 0:
             tiles.append(decode_line(line_num, line_without_comment))
@@ -278,3 +416,170 @@ def load_tiles(path):
         return tiles
     else:
         raise InvalidFormat(0, "empty deck")
+
+
+# The directory, next to deck files, holding their compiled forms.
+CACHE_DIRECTORY = "__deckcache__"
+
+# The header of the compiled form: magic number, number of distinct tiles,
+# number of tiles; each distinct tile is then coded on `_TILE_SIZE` bytes
+# (number of links, then sides and color code of each link), and followed by
+# the index of each tile of the deck in the distinct tiles (little-endian
+# unsigned 16-bit integers).
+_MAGIC = b"MFCDECK1"
+_HEADER = struct.Struct("<8sII")
+_TILE_SIZE = 7
+_COLORS = {code: color for color, code in player.COLOR_CODE.items()}
+
+# The number of decks kept in memory by `load_tiles`.
+MAX_LOADED_DECKS = 16
+
+# The tiles of the decks loaded most recently, indexed by hash of the file
+# content, the least recently used first.
+_loaded_decks = collections.OrderedDict()
+
+
+def compile_tiles(tiles):
+    """
+    Return the compiled form of the passed list of tiles, as `bytes`.
+    """
+    distinct = []
+    indices = {}
+    codes = array.array("H")
+    for tile_ in tiles:
+        key = (tile_.type_id, tile_.rotation)
+        index = indices.get(key)
+        if index is None:
+            index = indices[key] = len(distinct)
+            distinct.append(tile_)
+        codes.append(index)
+    if sys.byteorder != "little":
+        codes.byteswap()
+    parts = [_HEADER.pack(_MAGIC, len(distinct), len(codes))]
+    for tile_ in distinct:
+        code = bytearray(_TILE_SIZE)
+        code[0] = len(tile_.links)
+        for offset, link in zip((1, 4), tile_.links):
+            first_side, second_side = sorted(
+                tile.SIDE_INDEX[side] for side in link.sides
+            )
+            code[offset] = first_side
+            code[offset + 1] = second_side
+            code[offset + 2] = player.COLOR_CODE[link.color]
+        parts.append(bytes(code))
+    parts.append(codes.tobytes())
+    return b"".join(parts)
+
+
+def decompile_tiles(data):
+    """
+    Decode the compiled form of a list of tiles (see `compile_tiles`) into
+    the list of its (shared) tiles. Raises `ValueError` if the data is not a
+    valid compiled form.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("truncated compiled deck")
+    magic, num_distinct, num_tiles = _HEADER.unpack_from(data)
+    start = _HEADER.size + num_distinct * _TILE_SIZE
+    if magic != _MAGIC or len(data) != start + 2 * num_tiles:
+        raise ValueError("invalid compiled deck")
+    distinct = []
+    for offset in range(_HEADER.size, start, _TILE_SIZE):
+        end = offset + _TILE_SIZE
+        code = data[offset:end]
+        links = [
+            tile.Link.intern(
+                (tile.SIDES[code[index]], tile.SIDES[code[index + 1]]),
+                _COLORS[code[index + 2]],
+            )
+            for index in (1, 4)[: code[0]]
+        ]
+        distinct.append(tile.Tile.intern(links))
+    codes = array.array("H")
+    codes.frombytes(data[start:])
+    if sys.byteorder != "little":
+        codes.byteswap()
+    return [distinct[index] for index in codes]
+
+
+def _compiled_path(path, digest):
+    directory, name = os.path.split(path)
+    return os.path.join(directory, CACHE_DIRECTORY, f"{name}.{digest}")
+
+
+def _read_compiled(path, digest):
+    """
+    Return the tiles of the compiled form of the deck file whose path and hash
+    are passed, or `None` if there is no valid compiled form.
+    """
+    try:
+        with open(_compiled_path(path, digest), "rb") as file:
+            return decompile_tiles(file.read())
+    except (OSError, ValueError, IndexError, KeyError):
+        return None
+
+
+def _write_compiled(path, digest, tiles):
+    """
+    Store the compiled form of the deck file whose path and hash are passed,
+    if possible (e.g. the directory of the file may be read-only), and remove
+    the compiled forms of the previous contents of the file.
+    """
+    compiled_path = _compiled_path(path, digest)
+    directory, compiled_name = os.path.split(compiled_path)
+    prefix = os.path.basename(path) + "."
+    temporary_path = f"{compiled_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temporary_path, "wb") as file:
+            file.write(compile_tiles(tiles))
+        os.replace(temporary_path, compiled_path)
+        for name in os.listdir(directory):
+            # compiled forms of the same file are named after it and a hash
+            if (
+                name != compiled_name
+                and name.startswith(prefix)
+                and len(name) == len(compiled_name)
+                and not name.endswith(".tmp")
+            ):
+                os.remove(os.path.join(directory, name))
+    except OSError:
+        pass
+
+
+def load_tiles(path, use_cache=True):
+    """
+    Load the deck from the file whose path is passed. Raises `InvalidFormat` if
+    the file does not follow the specifiation above or contains no tiles, and
+    raises `IOError` if any i/o error happens.
+
+    Unless `use_cache` is false, the compiled form of the file is used if it
+    exists for the current content of the file, and written otherwise; the
+    last `MAX_LOADED_DECKS` decks loaded by the process are also kept in
+    memory (see `clear_cache`).
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if not use_cache:
+        return parse_tiles(data.decode())
+    digest = hashlib.sha256(data).hexdigest()
+    tiles = _loaded_decks.get(digest)
+    if tiles is None:
+        tiles = _read_compiled(path, digest)
+        if tiles is None:
+            tiles = parse_tiles(data.decode())
+            _write_compiled(path, digest, tiles)
+        tiles = _loaded_decks[digest] = tuple(tiles)
+        if len(_loaded_decks) > MAX_LOADED_DECKS:
+            _loaded_decks.popitem(last=False)
+    else:
+        _loaded_decks.move_to_end(digest)
+    return list(tiles)
+
+
+def clear_cache():
+    """
+    Forget the decks kept in memory by `load_tiles` (their compiled forms are
+    kept on disk).
+    """
+    _loaded_decks.clear()
@@ -0,0 +1,153 @@
+import dataclasses
+import sys
+
+"""
+This module defines the events emitted by a game while it is played, and the
+bus delivering them to the subscribed observers.
+
+Emitting code checks `EventBus.active` before building an event, so that a
+game nobody observes (e.g. in simulations) pays a single attribute read per
+emission point. Human-facing output is one observer among others (see
+`ConsoleObserver`).
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class TurnStarted:
+    """
+    A player is about to choose a move among `possible_moves`.
+    """
+
+    player: object
+    possible_moves: list
+
+
+@dataclasses.dataclass(frozen=True)
+class TilePlaced:
+    """
+    A player has placed a tile, at `position` (as `Coords` of the board before
+    the placement) with `rotation` (in degrees).
+    """
+
+    player: object
+    position: object
+    rotation: int
+    tile: object
+
+
+@dataclasses.dataclass(frozen=True)
+class PathClosed:
+    """
+    A road (see `roads.ClosedRoad`) has been closed by the last placement.
+    """
+
+    road: object
+
+
+@dataclasses.dataclass(frozen=True)
+class PawnPlaced:
+    """
+    A player has placed `num_pawns` pawns, and has `num_pawns_left` left.
+    """
+
+    player: object
+    num_pawns: int
+    num_pawns_left: int
+
+
+@dataclasses.dataclass(frozen=True)
+class GameOver:
+    """
+    The game is over, and won by the players of `winners`.
+    """
+
+    winners: list
+
+
+class EventBus:
+    """
+    A registry of callbacks, indexed by event type. The `active` attribute
+    tells whether at least one callback is registered.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self.active = False
+
+    def subscribe(self, event_type, callback):
+        """
+        Register `callback`, to be called with every event of `event_type`.
+        """
+        self._subscribers.setdefault(event_type, []).append(callback)
+        self.active = True
+
+    def unsubscribe(self, event_type, callback):
+        callbacks = self._subscribers.get(event_type, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self._subscribers[event_type]
+        self.active = bool(self._subscribers)
+
+    def wants(self, event_type):
+        """
+        Return whether events of `event_type` have at least one subscriber.
+        """
+        return event_type in self._subscribers
+
+    def emit(self, event):
+        for callback in self._subscribers.get(type(event), ()):
+            callback(event)
+
+    def __getstate__(self):
+        # subscribers are local to a process, and often not picklable
+        return {"_subscribers": {}, "active": False}
+
+
+class ConsoleObserver:
+    """
+    An observer printing the progress of a game onto `output` (by default,
+    the standard output): the board before each turn, the moves, the closed
+    roads, the pawns, and the winners.
+    """
+
+    def __init__(self, game, output=None):
+        self._game = game
+        self._output = output
+
+    def subscribe(self, bus):
+        bus.subscribe(TurnStarted, self.on_turn_started)
+        bus.subscribe(TilePlaced, self.on_tile_placed)
+        bus.subscribe(PathClosed, self.on_path_closed)
+        bus.subscribe(PawnPlaced, self.on_pawn_placed)
+        bus.subscribe(GameOver, self.on_game_over)
+
+    def _print(self, *args):
+        print(*args, file=self._output if self._output is not None else sys.stdout)
+
+    def on_turn_started(self, event):
+        self._game.display(self._output)
+        self._print(f"Au tour de {event.player} ({event.player.color.value}).")
+
+    def on_tile_placed(self, event):
+        self._print(
+            f"{event.player} a placé une tuile en {event.position} "
+            f"avec une rotation de {event.rotation} degrés."
+        )
+
+    def on_path_closed(self, event):
+        self._print(
+            f"Chemin {event.road.color.value} clos ({event.road.num_links} lien(s))."
+        )
+
+    def on_pawn_placed(self, event):
+        self._print(
+            f"{event.player} ({event.player.color.value}) place {event.num_pawns} "
+            f"pion(s), il lui en reste {event.num_pawns_left}."
+        )
+
+    def on_game_over(self, event):
+        self._game.display(self._output)
+        self._print(
+            "Vainqueur(s) :", ", ".join(str(winner) for winner in event.winners)
+        )
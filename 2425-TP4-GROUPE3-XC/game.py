@@ -1,6 +1,9 @@
 import board
 import deck
+import events
+import profiling
 import random
+import zobrist
 
 """
 This module defines the state of an in-progress game, as well as the game main
@@ -16,31 +19,148 @@ class Game:
     - a list of players;
     - a board;
     - a deck of tiles.
+
+    The deck is a `deck.Deck` of the tiles not drawn yet, the tile drawn by
+    the current player being kept aside (see `current_tile`); the next tile is
+    drawn at random when a move is done, with the random generator of the
+    game (see `determinize`).
+
+    A 64-bit Zobrist hash of the state (see `zobrist_hash`) is maintained as
+    moves are done and undone.
     """
 
-    def __init__(self, players, deck_path):
+    def __init__(
+        self,
+        players,
+        deck_path,
+        array_mode=False,
+        profile=False,
+        seed=None,
+        tiles=None,
+    ):
         """
         Create a game from a list of players, and an optional path to a file
         with the definition of the deck. If no path is provided, the default
         deck is implicitly used. Raises `deck.InvalidFormat` if the deck file
-        does not follow the expected specification.
+        does not follow the expected specification. The board is created in
+        array mode (see `board.Board`) if `array_mode` is true, and the
+        profiling counters (see `profiler`) are enabled if `profile` is true.
+        The tiles are drawn with a random generator of the game seeded with
+        `seed` (by default, from the operating system), so that a game can be
+        replayed whatever the other games played meanwhile.
+
+        If `tiles` is passed, the deck is made of these tiles instead, drawn
+        in this order (the first one being placed at the start of the game),
+        e.g. to replay a recorded game (see `record`).
         """
         assert len(players) > 0, "empty players"
         assert len(set(map(lambda p: p.color, players))) == len(
             players
         ), "duplicate player color"
         self._players = players
-        self._board = board.Board()
-        self._deck = (
-            deck.load_tiles(deck_path) if deck_path is not None else deck.make_tiles()
-        )
-        random.shuffle(self._deck)
-        self._board[board.Coords(row=0, column=0)] = self._deck.pop()
+        self._board = board.Board(array_mode=array_mode)
+        self._profiler = profiling.Profiler(enabled=profile)
+        self._board.profiler = self._profiler
+        for player_ in players:
+            self._board.add_player(player_)
+        if tiles is not None:
+            # the last tile is drawn first (see `deck.InOrder`)
+            self._deck = deck.Deck(reversed(tiles))
+            self._rng = deck.InOrder()
+        else:
+            self._deck = deck.Deck(
+                deck.load_tiles(deck_path)
+                if deck_path is not None
+                else deck.make_tiles()
+            )
+            self._rng = random.Random(seed)
+        # le générateur propre à la partie, dont l'état est restauré par
+        # `undo_move` (contrairement à celui passé à `determinize`)
+        self._game_rng = self._rng
+        self._start_tile = self._deck.draw(self._rng)
+        self._board[board.Coords(row=0, column=0)] = self._start_tile
+        self._drawn_tile = self._deck.draw(self._rng) if self._deck else None
         self._current_player_index = 0
+        self._undo_stack = []
+        self._events = events.EventBus()
+        self._state_hash = self._compute_state_hash()
         height = 5
         width = 5
         self._tiles = [[None for _ in range(width)] for _ in range(height)]
     
+    @property
+    def board(self):
+        return self._board
+
+    @property
+    def events(self):
+        """
+        The `events.EventBus` on which the moves played through `apply_move`
+        and `play` are published (moves done by `do_move`, e.g. during a
+        search, are not).
+        """
+        return self._events
+
+    @property
+    def profiler(self):
+        """
+        The `profiling.Profiler` of the game, counting the calls and the
+        duration of its phases (move generation, moves, AI play, placements
+        and closure checks) while it is enabled.
+        """
+        return self._profiler
+
+    @property
+    def deck(self):
+        """
+        The `deck.Deck` of the tiles not drawn yet (not including the tile
+        drawn by the current player), e.g. to read its composition. Not to be
+        modified.
+        """
+        return self._deck
+
+    @property
+    def players(self):
+        return self._players
+
+    @property
+    def current_player_index(self):
+        return self._current_player_index
+
+    def is_over(self):
+        """
+        Indique si la partie est finie : un joueur a placé tous ses pions, ou
+        il ne reste plus de tuiles.
+        """
+        return self._drawn_tile is None or any(
+            player_.num_pawns == 0 for player_ in self._players
+        )
+
+    def winners(self):
+        """
+        Retourne la liste du ou des vainqueurs : les joueurs ayant placé le plus
+        de pions (i.e. à qui il en reste le moins).
+        """
+        fewest = min(player_.num_pawns for player_ in self._players)
+        return [player_ for player_ in self._players if player_.num_pawns == fewest]
+
+    def determinize(self, rng):
+        """
+        Fait piocher les prochaines tuiles (encore cachées) avec le générateur
+        `rng`, et retourne le générateur précédent, à passer à `restore_deck`.
+        Utilisé par les recherches pour échantillonner les pioches sans
+        modifier le générateur de la partie.
+        """
+        previous = self._rng
+        self._rng = rng
+        return previous
+
+    def restore_deck(self, rng):
+        """
+        Restaure le générateur de pioche retourné par `determinize`.
+        """
+        self._rng = rng
+
     def current_player(self):
         """
         Retourne le joueur qui doit jouer actuellement.
@@ -51,38 +171,212 @@ class Game:
         """
         Passe au tour suivant en changeant le joueur actif.
         """
+        previous_index = self._current_player_index
         self._current_player_index = (self._current_player_index + 1) % len(self._players)
+        self._state_hash ^= zobrist.player_to_move_key(
+            previous_index
+        ) ^ zobrist.player_to_move_key(self._current_player_index)
+
+    def _compute_state_hash(self):
+        """
+        Compute from scratch the part of the Zobrist hash of the state that is
+        not maintained by the board: the player to move, the pawn counts, the
+        composition of the deck and the drawn tile.
+        """
+        result = zobrist.player_to_move_key(self._current_player_index)
+        for index, player_ in enumerate(self._players):
+            result ^= zobrist.pawns_key(index, player_.num_pawns)
+        for type_id, count in self._deck.counts.items():
+            result ^= zobrist.deck_key(type_id, count)
+        if self._drawn_tile is not None:
+            result ^= zobrist.drawn_tile_key(self._drawn_tile.type_id)
+        return result
+
+    def zobrist_hash(self):
+        """
+        Retourne le hash de Zobrist (entier de 64 bits) de l'état de la partie :
+        tuiles posées (position, type et rotation), joueur en cours, pions des
+        joueurs, composition du deck et tuile piochée. Il est mis à jour en temps
+        constant à chaque coup.
+        """
+        return self._board.zobrist_hash ^ self._state_hash
 
+    def compute_zobrist_hash(self):
+        """
+        Recalcule entièrement le hash de `zobrist_hash`, par exemple pour
+        vérifier qu'aucune modification n'a été faite hors des méthodes de la
+        partie.
+        """
+        result = self._compute_state_hash()
+        for (row, column), tile in self._board.items():
+            result ^= board.tile_zobrist_key(row, column, tile)
+        return result
+
+    def current_tile(self):
+        """
+        Retourne la tuile piochée par le joueur en cours, ou `None` si le deck
+        était vide.
+        """
+        return self._drawn_tile
+
+    @profiling.profiled("Game.get_possible_moves")
     def get_possible_moves(self):
         """
-        Génère tous les coups possibles pour le joueur en cours. 
-        Retourne une liste de tuples (position, rotation).
+        Génère tous les coups possibles pour le joueur en cours, avec la tuile
+        qu'il a piochée (voir `board.Board.generate_possible_moves`).
+        Retourne une liste de `board.Move`, tuples (position, rotation).
+        """
+        drawn_tile = self.current_tile()
+        if drawn_tile is None:
+            return []
+        return self._board.generate_possible_moves(drawn_tile)
+
+    def do_move(self, move, next_type_id=None):
+        """
+        Joue le coup `move` (tuple (position, rotation)) pour le joueur en cours,
+        sans affichage ni vérification : pose la tuile piochée avec la rotation
+        demandée, place les pions des chemins clos, pioche la tuile suivante et
+        passe au joueur suivant. Le coup est enregistré pour pouvoir être
+        annulé par `undo_move`, ce qui permet d'explorer des coups sans copier
+        la partie.
+
+        Si `next_type_id` est passé, la tuile suivante est une tuile de ce type
+        (qui doit rester dans le deck) au lieu d'une tuile tirée au hasard, ce
+        qui permet à une recherche d'explorer chaque pioche possible.
+        """
+        position, rotation = move
+        state_hash = self._state_hash
+        drawn_tile = self._drawn_tile
+        rng_state = self._rng.getstate() if self._rng is self._game_rng else None
+        row, column = self._board.to_absolute(position)
+        self._board.place_at(row, column, self._board.rotate_tile(drawn_tile, rotation))
+        awarded = self._board.award_pawns()
+        self._undo_stack.append(
+            (
+                drawn_tile,
+                awarded,
+                self._current_player_index,
+                state_hash,
+                (row, column, rotation),
+                rng_state,
+            )
+        )
+        # pioche de la tuile suivante et mise à jour incrémentale du hash
+        state_hash ^= zobrist.drawn_tile_key(drawn_tile.type_id)
+        if self._deck:
+            next_tile = self._drawn_tile = (
+                self._deck.draw(self._rng)
+                if next_type_id is None
+                else self._deck.draw_type(next_type_id)
+            )
+            type_id = next_tile.type_id
+            count = self._deck.count(type_id)
+            state_hash ^= zobrist.deck_key(type_id, count + 1) ^ zobrist.deck_key(
+                type_id, count
+            )
+            state_hash ^= zobrist.drawn_tile_key(type_id)
+        else:
+            self._drawn_tile = None
+        for player_, num_pawns in awarded:
+            index = self._players.index(player_)
+            state_hash ^= zobrist.pawns_key(
+                index, player_.num_pawns + num_pawns
+            ) ^ zobrist.pawns_key(index, player_.num_pawns)
+        self._state_hash = state_hash
+        self.next_turn()
+
+    def undo_move(self):
+        """
+        Annule le dernier coup joué par `do_move` (ou `apply_move`) et non
+        encore annulé : le plateau, le deck, les pions des joueurs, le joueur
+        en cours et l'état du générateur de pioche de la partie sont restaurés
+        à l'identique, de sorte que les pioches suivantes ne changent pas.
+        """
+        assert self._undo_stack, "no move to undo"
+        drawn_tile, awarded, player_index, state_hash, _, rng_state = (
+            self._undo_stack.pop()
+        )
+        if rng_state is not None:
+            self._game_rng.setstate(rng_state)
+        for player_, num_pawns in awarded:
+            player_.num_pawns += num_pawns
+        self._board.undo_placement()
+        if self._drawn_tile is not None:
+            self._deck.undo_draw(self._drawn_tile)
+        self._drawn_tile = drawn_tile
+        self._current_player_index = player_index
+        self._state_hash = state_hash
+
+    @profiling.profiled("Game.play")
+    def play(self):
         """
-        # Obtenez toutes les positions adjacentes où une tuile peut être placée
-        possible_positions = self._board.get_adjacent_positions()
+        Boucle principale du jeu : fait jouer les joueurs à tour de rôle
+        jusqu'à la fin de la partie, et retourne la liste du ou des vainqueurs.
+        Les joueurs reçoivent la liste des coups possibles et la partie.
 
-        possible_moves = []
-        for position in possible_positions:
-            # Pour chaque position, tester toutes les rotations possibles
-            for rotation in [0, 90, 180, 270]:
-                possible_moves.append((position, rotation))  # Chaque coup est un tuple (position, rotation)
-        
-        return possible_moves
+        Rien n'est affiché : la progression de la partie est publiée sous forme
+        d'événements sur `events` (voir `events.ConsoleObserver` pour un
+        affichage dans le terminal).
+        """
+        events_ = self._events
+        while not self.is_over():
+            player_ = self.current_player()
+            possible_moves = self.get_possible_moves()
+            if events_.active:
+                events_.emit(events.TurnStarted(player_, possible_moves))
+            self.apply_move(player_.play(possible_moves, self))
+        winners = self.winners()
+        if events_.active:
+            events_.emit(events.GameOver(winners))
+        return winners
+
+    @property
+    def num_moves(self):
+        """
+        Le nombre de coups joués (et non annulés) depuis le début de la partie.
+        """
+        return len(self._undo_stack)
+
+    def drawn_tiles(self):
+        """
+        Retourne la liste des tuiles piochées jusqu'ici, dans l'ordre : la
+        tuile posée au début de la partie, les tuiles des coups joués (et non
+        annulés), puis la tuile piochée par le joueur en cours s'il y en a une.
+        """
+        result = [self._start_tile]
+        result.extend(entry[0] for entry in self._undo_stack)
+        if self._drawn_tile is not None:
+            result.append(self._drawn_tile)
+        return result
 
-    def display(self):
+    def moves_played(self):
         """
-        Print the board and key info about the players onto the standard output.
+        Retourne la liste des coups joués (et non annulés), dans l'ordre, sous
+        forme de triplets (ligne, colonne, rotation) où la position est en
+        coordonnées absolues (voir `board.Board.to_absolute`), qui ne changent
+        pas quand le plateau s'agrandit.
         """
-        self._board.display()
-        print()
+        return [entry[4] for entry in self._undo_stack]
+
+    def display(self, output=None, viewport=None):
+        """
+        Print the board (or its `viewport`, see `board.Board.display`) and key
+        info about the players onto `output` (by default, the standard output).
+        """
+        self._board.display(output, viewport)
+        print(file=output)
         for player_ in self._players:
-            print(f"{player_} ({player_.color.value}): {player_.num_pawns}")
-        print()
+            print(
+                f"{player_} ({player_.color.value}): {player_.num_pawns}", file=output
+            )
+        print(file=output)
 
+    @profiling.profiled("Game.apply_move")
     def apply_move(self, move):
         """
-        Applique un coup donné sur le plateau.
-    
+        Applique un coup donné sur le plateau, après avoir vérifié qu'il peut
+        être joué, et publie les événements correspondants sur `events`.
+
         :param move: Un tuple (position, rotation) représentant le coup à jouer.
         """
 
@@ -90,36 +384,39 @@ class Game:
         # Récupérer les attributs x et y de l'objet Coords
         row = position.row
         col = position.column
-        print(f"Move position: {position}, rotation: {rotation}")
 
         # Récupérer le joueur actuel et la tuile correspondante
         current_player = self.current_player()
         if current_player.num_pawns == 0:
             raise ValueError(f"{current_player} n'a plus de pions à placer.")
-        
+
         # Vérifier que la position est valide sur le plateau
-        if not (0 <= row < self._board._height and 0 <= col < self._board._width):
-            raise ValueError(f"La position {position} est en dehors des limites du plateau.")
-        
-        # Vérifier que le deck n'est pas vide avant de piocher
-        if not self._deck:
-            raise ValueError("Le deck est vide. Impossible de tirer une nouvelle tuile.")
-        
-        # Créer une nouvelle tuile et l'appliquer avec la rotation donnée
-        new_tile = self._deck.pop()
+        if not (0 <= row < self._board.height and 0 <= col < self._board.width):
+            raise ValueError(
+                f"La position {position} est en dehors des limites du plateau."
+            )
+
+        # Vérifier qu'une tuile a été piochée
+        if self._drawn_tile is None:
+            raise ValueError(
+                "Le deck est vide. Impossible de tirer une nouvelle tuile."
+            )
 
         if rotation % 90 != 0:
             raise ValueError("La rotation doit être un multiple de 90 degrés.")
-        
-        for _ in range(rotation // 90):
-            new_tile.rotate_clockwise()
-
-        # Placer la tuile sur le plateau
-        self._board.place_tile_with_rotation(position, new_tile, rotation)
 
-        # Mettre à jour les pions du joueur
-        current_player.num_pawns -= 1
+        # Poser la tuile piochée, placer les pions des chemins clos par la pose,
+        # piocher la tuile suivante et passer au joueur suivant
+        self.do_move(move)
 
-        # Confirmation du placement
-        print(f"{current_player} a placé une tuile en {position} avec une rotation de {rotation} degrés. "
-          f"Il reste {current_player.num_pawns} pions.")
+        # Publier ce qui s'est passé
+        events_ = self._events
+        if events_.active:
+            drawn_tile, awarded, _, _, _, _ = self._undo_stack[-1]
+            events_.emit(
+                events.TilePlaced(current_player, position, rotation, drawn_tile)
+            )
+            for road in self._board.last_closed_roads:
+                events_.emit(events.PathClosed(road))
+            for player_, num_pawns in awarded:
+                events_.emit(events.PawnPlaced(player_, num_pawns, player_.num_pawns))
@@ -0,0 +1,175 @@
+import dataclasses
+import math
+import random
+import time
+
+"""
+This module implements a Monte Carlo Tree Search (MCTS) for the multiplayer
+game, used by the `player.AILevel.MCTS` level of `player.AIPlayer`.
+
+As the order of the tiles still in the deck is unknown to the players, each
+iteration starts by shuffling it (determinisation), and the tree is shared by
+all the determinisations: a node is identified by the sequence of moves
+leading to it, and the statistics of a child only count the iterations where
+its move was legal (information set MCTS). Children are selected with UCT,
+iterations are completed by uniformly random rollouts, and every state change
+is made with `game.Game.do_move`/`undo_move`, so that the game is never
+copied.
+"""
+
+
+# The default exploration constant of UCT.
+EXPLORATION = 0.7
+
+# The default number of iterations, when neither a number of iterations nor a
+# time budget is passed to `search`.
+DEFAULT_ITERATIONS = 1000
+
+
+@dataclasses.dataclass(frozen=True)
+class SearchStats:
+    """
+    Statistics about a search: number of iterations (i.e. simulated games),
+    elapsed wall-clock time in seconds, and resulting throughput.
+    """
+
+    iterations: int
+    elapsed: float
+
+    @property
+    def simulations_per_second(self):
+        return self.iterations / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.iterations} simulations in {self.elapsed:.3f} s "
+            f"({self.simulations_per_second:.0f} simulations/s)"
+        )
+
+
+class Node:
+    """
+    A node of the search tree: the move leading to it, the index of the player
+    who played that move, and the statistics of the iterations that went
+    through it.
+    """
+
+    __slots__ = ("move", "player_index", "children", "visits", "reward", "available")
+
+    def __init__(self, move, player_index):
+        self.move = move
+        self.player_index = player_index
+        self.children = {}
+        self.visits = 0
+        self.reward = 0.0
+        self.available = 0
+
+    def uct(self, exploration):
+        return self.reward / self.visits + exploration * math.sqrt(
+            math.log(self.available) / self.visits
+        )
+
+
+def rewards(game):
+    """
+    Return the list of the rewards of the players of the (finished) game: the
+    winners share a reward of 1.
+    """
+    winners = game.winners()
+    players = game.players
+    return [1 / len(winners) if player_ in winners else 0.0 for player_ in players]
+
+
+def _select_or_expand(game, node, rng, exploration):
+    """
+    Return the child of `node` to go through, in the current determinisation
+    of `game`, or `None` if the game is over. A child whose move has never
+    been tried is created first; otherwise the legal child maximizing UCT is
+    chosen.
+    """
+    moves = game.get_possible_moves()
+    if not moves:
+        return None
+    children = node.children
+    untried = [move for move in moves if move not in children]
+    legal = [children[move] for move in moves if move in children]
+    for child in legal:
+        child.available += 1
+    if untried:
+        move = rng.choice(untried)
+        child = Node(move, game.current_player_index)
+        child.available = 1
+        children[move] = child
+        return child
+    return max(legal, key=lambda child: child.uct(exploration))
+
+
+def search(
+    game,
+    iterations=None,
+    time_budget=None,
+    exploration=EXPLORATION,
+    rng=random,
+    root=None,
+):
+    """
+    Search the best move for the current player of `game`, running at most
+    `iterations` iterations and for at most `time_budget` seconds (if neither
+    is passed, `DEFAULT_ITERATIONS` iterations are run). Returns the root of
+    the search tree and the `SearchStats` of the search (see `best_move` to
+    pick a move from the tree). The game is left unchanged.
+    """
+    if iterations is None and time_budget is None:
+        iterations = DEFAULT_ITERATIONS
+    if root is None:
+        root = Node(None, None)
+    start = time.perf_counter()
+    deadline = start + time_budget if time_budget is not None else None
+    done = 0
+    while (iterations is None or done < iterations) and (
+        deadline is None or time.perf_counter() < deadline
+    ):
+        deck_order = game.determinize(rng)
+        path = [root]
+        node = root
+        depth = 0
+        # selection and expansion
+        while not game.is_over():
+            child = _select_or_expand(game, node, rng, exploration)
+            if child is None:
+                break
+            game.do_move(child.move)
+            depth += 1
+            path.append(child)
+            node = child
+            if child.visits == 0:
+                break
+        # rollout
+        while not game.is_over():
+            moves = game.get_possible_moves()
+            if not moves:
+                break
+            game.do_move(rng.choice(moves))
+            depth += 1
+        # backpropagation
+        results = rewards(game)
+        for node in path:
+            node.visits += 1
+            if node.player_index is not None:
+                node.reward += results[node.player_index]
+        for _ in range(depth):
+            game.undo_move()
+        game.restore_deck(deck_order)
+        done += 1
+    return root, SearchStats(done, time.perf_counter() - start)
+
+
+def best_move(root, possible_moves):
+    """
+    Return the move of `possible_moves` whose child of `root` was the most
+    visited (the first move if none was visited).
+    """
+    return max(
+        possible_moves,
+        key=lambda move: (root.children[move].visits if move in root.children else -1),
+    )
@@ -1,15 +1,82 @@
+import argparse
+import asyncio
 import deck
+import events
 import game
+import json
 import player
+import record
+import server
+import simulation
 import sys
 
 """
 This module is the main module of the program, and can be executed to play a
-game of "My First Carcassonne".
+game of "My First Carcassonne", or to simulate games between non-human
+players (with `--simulate`, possibly over several processes with `--jobs`,
+the results being written as JSON with `--output`), or to host games for
+remote players (with `--serve`, see `server`).
 """
 
-# Entry point of the program
-if __name__ == "__main__":
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="My First Carcassonne")
+    parser.add_argument("deck_path", nargs="?", help="path to a deck file")
+    parser.add_argument(
+        "--simulate",
+        type=int,
+        metavar="N",
+        help="play N games silently between the players of --players",
+    )
+    parser.add_argument(
+        "--players",
+        default="ai:hard,ai:easy,random",
+        help="line-up of the simulated games (e.g. ai:hard,ai:easy,random)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the simulated games, each game being seeded from it",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes playing the simulated games",
+    )
+    parser.add_argument(
+        "--output",
+        metavar="PATH",
+        help="write the results of the simulated games as JSON ('-': stdout)",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="record the simulated games into PATH (as JSON lines if it ends "
+        "with .jsonl, in binary form otherwise)",
+    )
+    parser.add_argument(
+        "--serve",
+        type=int,
+        metavar="PORT",
+        help="host games for remote players on the local TCP port PORT",
+    )
+    parser.add_argument(
+        "--move-timeout",
+        type=float,
+        default=server.DEFAULT_MOVE_TIMEOUT,
+        help="seconds a remote player has to choose a move (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print the time spent in each phase after the game or the batch",
+    )
+    return parser.parse_args()
+
+
+def play_interactive(deck_path, profile=False):
     # create several players
     xclerc = player.HumanPlayer(
         color=player.Color.BLUE, num_pawns=game.NUM_PAWNS, name="xclerc"
@@ -20,13 +87,90 @@ if __name__ == "__main__":
     random_player = player.RandomPlayer(
         color=player.Color.YELLOW, num_pawns=game.NUM_PAWNS
     )
-    # create a Game instance
-    deck_path = sys.argv[1] if len(sys.argv) >= 2 else None
+    # create a Game instance, and play it while printing its progress
+    game_state = game.Game(
+        players=[xclerc, ai_player, random_player],
+        deck_path=deck_path,
+        profile=profile,
+    )
+    events.ConsoleObserver(game_state).subscribe(game_state.events)
+    game_state.play()
+    if profile:
+        print(game_state.profiler.report())
+
+
+def simulate(
+    deck_path,
+    lineup,
+    num_games,
+    seed=0,
+    jobs=1,
+    output=None,
+    profile=False,
+    record_path=None,
+):
     try:
-        game_state = game.Game(
-            players=[xclerc, ai_player, random_player],
-            deck_path=deck_path,
+        specifications = simulation.parse_lineup(lineup)
+    except ValueError as ve:
+        print("*** line-up error", ve)
+        return
+    if jobs < 1:
+        print("*** invalid number of jobs", jobs)
+        return
+    with simulation.BatchRunner(jobs) as runner:
+        batch = runner.run(
+            specifications,
+            num_games,
+            deck_path,
+            profile,
+            seed,
+            recorded=record_path is not None,
         )
+    if record_path is not None:
+        if record_path.endswith(".jsonl"):
+            with open(record_path, "w") as file:
+                record.write_jsonl(file, batch.records())
+        else:
+            with open(record_path, "wb") as file:
+                record.write_binary(file, batch.records())
+    results = dict(batch.to_json(), seed=seed, jobs=jobs)
+    if output == "-":
+        print(json.dumps(results, indent=2))
+    else:
+        print(batch.report())
+        if output is not None:
+            with open(output, "w") as file:
+                json.dump(results, file, indent=2)
+    if profile:
+        # keep the standard output valid JSON
+        print(batch.profiler().report(), file=sys.stderr if output == "-" else None)
+
+
+# Entry point of the program
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    try:
+        if arguments.serve is not None:
+            asyncio.run(
+                server.serve(
+                    port=arguments.serve,
+                    move_timeout=arguments.move_timeout,
+                    deck_path=arguments.deck_path,
+                )
+            )
+        elif arguments.simulate is not None:
+            simulate(
+                arguments.deck_path,
+                arguments.players,
+                arguments.simulate,
+                arguments.seed,
+                arguments.jobs,
+                arguments.output,
+                arguments.profile,
+                arguments.record,
+            )
+        else:
+            play_interactive(arguments.deck_path, arguments.profile)
     except deck.InvalidFormat as dif:
         print("*** deck error", dif)
 
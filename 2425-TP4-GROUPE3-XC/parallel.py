@@ -0,0 +1,123 @@
+import concurrent.futures
+import math
+import mcts
+import os
+import random
+import time
+
+"""
+This module spreads the Monte Carlo Tree Search of `mcts` over several
+processes (root parallelism): each worker searches a copy of the game with
+its own random generator, and the statistics of the children of the roots
+are summed once all the workers are done.
+
+The pool of processes is created on the first search and reused by the next
+ones, so that the cost of starting the workers is only paid once.
+"""
+
+
+def _search_in_worker(game, iterations, deadline, seed, exploration):
+    """
+    Run a search in a worker process, and return the `(visits, reward)`
+    statistics of each move of the root along with the number of iterations.
+    The search stops after `iterations` iterations (if not `None`) or at the
+    `deadline` (as returned by `time.time`, if not `None`).
+    """
+    time_budget = None
+    if deadline is not None:
+        time_budget = max(0.0, deadline - time.time())
+    root, stats = mcts.search(
+        game,
+        iterations=iterations,
+        time_budget=time_budget,
+        exploration=exploration,
+        rng=random.Random(seed),
+    )
+    children = {
+        move: (child.visits, child.reward) for move, child in root.children.items()
+    }
+    return children, stats.iterations
+
+
+class RootParallelSearch:
+    """
+    A root-parallel MCTS over a pool of `num_workers` processes (by default,
+    one per core).
+    """
+
+    def __init__(self, num_workers=None, exploration=mcts.EXPLORATION):
+        self._num_workers = num_workers if num_workers is not None else os.cpu_count()
+        assert self._num_workers > 0, "invalid num_workers"
+        self._exploration = exploration
+        self._executor = None
+
+    @property
+    def num_workers(self):
+        return self._num_workers
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._num_workers
+            )
+        return self._executor
+
+    def search(self, game, iterations=None, time_budget=None, rng=random):
+        """
+        Search the best move for the current player of `game`, with at most
+        `iterations` iterations in total and for at most `time_budget` seconds
+        (if neither is passed, each worker runs `mcts.DEFAULT_ITERATIONS`
+        iterations). Returns the merged `(visits, reward)` statistics of the
+        moves of the root, and the `mcts.SearchStats` of the whole search.
+        """
+        if iterations is None and time_budget is None:
+            iterations = mcts.DEFAULT_ITERATIONS * self._num_workers
+        start = time.perf_counter()
+        deadline = time.time() + time_budget if time_budget is not None else None
+        per_worker = (
+            math.ceil(iterations / self._num_workers)
+            if iterations is not None
+            else None
+        )
+        executor = self._get_executor()
+        futures = [
+            executor.submit(
+                _search_in_worker,
+                game,
+                per_worker,
+                deadline,
+                rng.getrandbits(64),
+                self._exploration,
+            )
+            for _ in range(self._num_workers)
+        ]
+        merged = {}
+        total_iterations = 0
+        for future in futures:
+            children, num_iterations = future.result()
+            total_iterations += num_iterations
+            for move, (visits, reward) in children.items():
+                merged_visits, merged_reward = merged.get(move, (0, 0.0))
+                merged[move] = (merged_visits + visits, merged_reward + reward)
+        return merged, mcts.SearchStats(total_iterations, time.perf_counter() - start)
+
+    def close(self):
+        """
+        Shut the pool of processes down; a later search starts a new one.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def best_move(statistics, possible_moves):
+    """
+    Return the move of `possible_moves` with the most merged visits.
+    """
+    return max(possible_moves, key=lambda move: statistics.get(move, (-1, 0.0))[0])
@@ -1,5 +1,14 @@
+import array_board
 import enum
+import expectimax
+import mcts
+import numpy
+import parallel
+import profiling
 import random
+import transposition
+
+from utils import Coords
 
 """
 This module defines the different kinds of players (both their state and
@@ -25,6 +34,19 @@ COLOR_LETTER = {
     Color.YELLOW: "Y",
 }
 
+# The small integers coding the colors in arrays (0 standing for no color, see
+# `array_board`).
+COLOR_CODE = {color: code for code, color in enumerate(Color, start=1)}
+
+# The default time budget of the expectimax AI level, in seconds per move
+# (see `expectimax` for the latency of each depth). The MCTS level has none by
+# default, its moves being bounded by a number of iterations only.
+DEFAULT_TIME_BUDGET = 1.0
+
+# The value of the `time_budget` of `AIPlayer` standing for the default time
+# budget of its level.
+_LEVEL_TIME_BUDGET = object()
+
 
 class Player:
     """
@@ -33,6 +55,8 @@ class Player:
     - a number of pawns still to place (mutable).
     """
 
+    __slots__ = ("_color", "_num_pawns")
+
     def __init__(self, color, num_pawns):
         assert num_pawns > 0, "invalida num_pawns"
         self._color = color
@@ -58,6 +82,8 @@ class HumanPlayer(Player):
     mutable). Its behavior is read from the standard input.
     """
 
+    __slots__ = ("_name",)
+
     def __init__(self, color, num_pawns, name):
         super().__init__(color, num_pawns)
         assert name.strip(), "empty name"
@@ -70,7 +96,7 @@ class HumanPlayer(Player):
     def __str__(self):
         return self._name
     
-    def play(self, possible_moves):
+    def play(self, possible_moves, game=None):
         """
         Affiche les coups possibles et demande à l'utilisateur de choisir.
         """
@@ -85,20 +111,28 @@ class HumanPlayer(Player):
 class RandomPlayer(Player):
     """
     A random player, provided mainly for testing, is a player whose behavior is
-    random.
+    random, drawn from its own random generator seeded with `seed` (by
+    default, from the operating system).
     """
 
-    def __init__(self, color, num_pawns):
+    __slots__ = ("_rng",)
+
+    def __init__(self, color, num_pawns, seed=None):
         super().__init__(color, num_pawns)
+        self._rng = random.Random(seed)
+
+    @property
+    def rng(self):
+        return self._rng
 
     def __str__(self):
         return "random"
     
-    def play(self, possible_moves):
+    def play(self, possible_moves, game=None):
         """
         Choisit un coup au hasard dans la liste des coups possibles.
         """
-        return random.choice(possible_moves)
+        return self._rng.choice(possible_moves)
 
 
 class AILevel(enum.Enum):
@@ -108,35 +142,138 @@ class AILevel(enum.Enum):
 
     EASY = "easy"
     HARD = "hard"
+    MCTS = "mcts"
+    EXPECTIMAX = "expectimax"
 
 
 class AIPlayer(Player):
     """
-    An AI player is a player additionally defined by a difficulty level.
+    An AI player is a player additionally defined by a difficulty level. The
+    `AILevel.MCTS` level searches its moves with `mcts.search`, within a
+    budget of `iterations` iterations and/or `time_budget` seconds; with
+    `workers` greater than 1, the search is spread over a pool of processes
+    (see `parallel.RootParallelSearch`), kept from one move to the other.
+    The `AILevel.EXPECTIMAX` level searches its moves with
+    `expectimax.search`, `depth` moves deep and within `time_budget` seconds,
+    keeping its results from one move to the other in a transposition table
+    of `table_size` slots with the replacement policy `table_policy`.
+    Both searches draw from the random generator of the player, seeded with
+    `seed` (by default, from the operating system), and stop after
+    `time_budget` seconds (by default, `DEFAULT_TIME_BUDGET` for the
+    expectimax level, and no limit but `iterations` for the MCTS level, see
+    `mcts.DEFAULT_ITERATIONS`; `None` for no limit but `iterations` or
+    `depth`, e.g. for reproducible games).
     """
 
-    def __init__(self, color, num_pawns, level):
+    __slots__ = (
+        "_level",
+        "_iterations",
+        "_time_budget",
+        "_depth",
+        "_workers",
+        "_parallel_search",
+        "_last_search_stats",
+        "_rng",
+        "_table_size",
+        "_table_policy",
+        "_table",
+    )
+
+    def __init__(
+        self,
+        color,
+        num_pawns,
+        level,
+        iterations=None,
+        time_budget=_LEVEL_TIME_BUDGET,
+        workers=1,
+        depth=expectimax.DEFAULT_DEPTH,
+        seed=None,
+        table_size=transposition.DEFAULT_SIZE,
+        table_policy=transposition.ReplacementPolicy.DEPTH_PREFERRED,
+    ):
         super().__init__(color, num_pawns)
+        assert workers > 0, "invalid workers"
+        assert depth > 0, "invalid depth"
+        assert table_size > 0, "invalid table_size"
         self._level = level
+        self._iterations = iterations
+        if time_budget is _LEVEL_TIME_BUDGET:
+            time_budget = DEFAULT_TIME_BUDGET if level == AILevel.EXPECTIMAX else None
+        self._time_budget = time_budget
+        self._depth = depth
+        self._workers = workers
+        self._parallel_search = None
+        self._last_search_stats = None
+        self._rng = random.Random(seed)
+        self._table_size = table_size
+        self._table_policy = table_policy
+        # created by the first search
+        self._table = None
 
     @property
     def level(self):
         return self._level
 
+    @property
+    def rng(self):
+        return self._rng
+
+    @property
+    def table(self):
+        """
+        The transposition table of the expectimax searches (`None` before the
+        first one).
+        """
+        return self._table
+
+    @property
+    def last_search_stats(self):
+        """
+        The `mcts.SearchStats` (or `expectimax.SearchStats`) of the last search
+        (`None` before the first one), including the throughput achieved.
+        """
+        return self._last_search_stats
+
     def __str__(self):
         return f"AI ({self._level})"
 
+    def __getstate__(self):
+        # the pool of processes stays with the original player, and the
+        # transposition table is not worth copying
+        state = {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+        }
+        state["_parallel_search"] = None
+        state["_table"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def close(self):
+        """
+        Shut down the pool of processes used by the parallel search, if any.
+        """
+        if self._parallel_search is not None:
+            self._parallel_search.close()
+            self._parallel_search = None
+
+    @staticmethod
     def evaluate_pawn_placement(position, player_color, board):
         """
         Évalue combien de pions du joueur seront placés à cette position.
     
-        :param position: Coordonnées (row, column) de la position où la tuile sera placée.
+        :param position: Coordonnées (`Coords`) de la position où la tuile sera placée.
         :param player_color: La couleur du joueur.
         :param board: L'état actuel du plateau (grille de tuiles).
     
         :return: Le nombre de pions que le joueur peut placer à cette position.
         """
-        row, col = position
+        row, col = position.row, position.column
         score = 0
 
         # Vérifier les connexions possibles aux tuiles adjacentes
@@ -149,8 +286,8 @@ class AIPlayer(Player):
 
         for adj_row, adj_col in adjacent_tiles:
             # Vérifier que la position adjacente est valide et sur le plateau
-            if 0 <= adj_row < board._height and 0 <= adj_col < board._width:
-                adjacent_tile = board._tiles[adj_row][adj_col]
+            if 0 <= adj_row < board.height and 0 <= adj_col < board.width:
+                adjacent_tile = board[Coords(adj_row, adj_col)]
                 if adjacent_tile is not None:
                     # Si la tuile adjacente est occupée par le même joueur
                     for link in adjacent_tile.links:
@@ -160,19 +297,19 @@ class AIPlayer(Player):
 
         return score
     
-
+    @staticmethod
     def evaluate_opponent_impact(position, player_color, board, players):
         """
         Évalue l'impact négatif d'un coup sur les adversaires.
     
-        :param position: Coordonnées (row, column) de la position où la tuile sera placée.
+        :param position: Coordonnées (`Coords`) de la position où la tuile sera placée.
         :param player_color: La couleur du joueur.
         :param board: L'état actuel du plateau (grille de tuiles).
         :param players: La liste des joueurs dans la partie.
     
         :return: Un score négatif si cela aide les adversaires.
         """
-        row, col = position
+        row, col = position.row, position.column
         negative_impact = 0
 
         # Vérifier les connexions possibles aux tuiles adjacentes
@@ -185,8 +322,8 @@ class AIPlayer(Player):
 
         for adj_row, adj_col in adjacent_tiles:
             # Vérifier que la position adjacente est valide et sur le plateau
-            if 0 <= adj_row < board._height and 0 <= adj_col < board._width:
-                adjacent_tile = board._tiles[adj_row][adj_col]
+            if 0 <= adj_row < board.height and 0 <= adj_col < board.width:
+                adjacent_tile = board[Coords(adj_row, adj_col)]
                 if adjacent_tile is not None:
                     # Vérifier si l'adversaire est présent dans les connexions de cette tuile
                     for link in adjacent_tile.links:
@@ -196,8 +333,8 @@ class AIPlayer(Player):
 
         return negative_impact
 
-
-    def evaluate_move_fn(move, player_color, difficulty, board,players):
+    @staticmethod
+    def evaluate_move_fn(move, player_color, difficulty, board, players):
         """
         Évalue un coup donné en fonction du niveau de difficulté.
         - move : un tuple (position, rotation)
@@ -208,30 +345,97 @@ class AIPlayer(Player):
         position, rotation = move  # Décomposer le tuple (position, rotation)
 
         # Critère de base : dans tous les cas, on évalue la position en fonction des pions que cela place
-        score = evaluate_pawn_placement(position, player_color, board)
+        score = AIPlayer.evaluate_pawn_placement(position, player_color, board)
 
         if difficulty == 'easy':
             # Niveau EASY : se concentrer uniquement sur le placement de pions du joueur
             return score  # Simplement maximiser le nombre de pions du joueur
         elif difficulty == 'hard':
             # Niveau HARD : minimiser les pions adverses et maximiser les pions du joueur
-            score -= evaluate_opponent_impact(position, player_color, board, players)  # Pénaliser si cela aide les adversaires
+            score += AIPlayer.evaluate_opponent_impact(position, player_color, board, players)  # Pénaliser si cela aide les adversaires
             return score
-    
-    def play(self, possible_moves, evaluate_move_fn):
+
+    @staticmethod
+    def evaluate_moves(possible_moves, player_color, difficulty, board):
+        """
+        Évalue tous les coups de `possible_moves` en une seule passe vectorisée,
+        et retourne le tableau NumPy de leurs scores, dans l'ordre des coups.
+        Les scores sont ceux de `evaluate_move_fn` : le nombre de liens de la
+        couleur du joueur sur les tuiles voisines de la position, diminué en
+        niveau 'hard' du nombre de liens des autres couleurs.
+        """
+        # les coups d'une même position ont le même score
+        cell_indices = {}
+        move_cells = numpy.array(
+            [
+                cell_indices.setdefault(position, len(cell_indices))
+                for position, _ in possible_moves
+            ],
+            dtype=numpy.intp,
+        )
+        if not cell_indices:
+            return numpy.zeros(0, dtype=numpy.int32)
+        rows, columns = zip(*map(board.to_absolute, cell_indices))
+        sides = array_board.neighbour_sides(board, rows, columns)
+        # chaque lien couvre deux côtés de sa tuile
+        own = numpy.count_nonzero(sides == COLOR_CODE[player_color], axis=(1, 2))
+        scores = own // 2
+        if difficulty == "hard":
+            others = numpy.count_nonzero(sides != array_board.NO_COLOR, axis=(1, 2))
+            scores -= (others - own) // 2
+        return scores[move_cells]
+
+    @profiling.profiled(
+        "AIPlayer.play", lambda self, possible_moves, game: game.profiler
+    )
+    def play(self, possible_moves, game):
         """
         Pour un joueur IA, sélectionne un coup en fonction du niveau de difficulté.
         - Niveau EASY : Choisit le coup qui place le maximum de pions.
         - Niveau HARD : Maximise les pions du joueur et minimise ceux de l'adversaire.
-        
+        - Niveau MCTS : Choisit le coup le plus visité par une recherche arborescente
+          Monte-Carlo (voir `mcts.search`).
+        - Niveau EXPECTIMAX : Choisit le meilleur coup d'une recherche expectimax
+          pondérant les pioches par la composition du deck (voir
+          `expectimax.search`).
+
         :param possible_moves: Liste des coups possibles.
-        :param evaluate_move_fn: Fonction pour évaluer les coups.
+        :param game: La partie en cours (`game.Game`), laissée inchangée.
         :return: Le coup choisi.
         """
-        if self._level == AILevel.EASY:
-            # Choisir le coup qui place le maximum de pions pour le joueur
-            best_move = max(possible_moves, key=lambda move: evaluate_move_fn(move, self.color, 'easy'))
-        elif self._level == AILevel.HARD:
-            # Choisir le coup qui maximise les pions du joueur et minimise ceux des adversaires
-            best_move = max(possible_moves, key=lambda move: evaluate_move_fn(move, self.color, 'hard'))
-        return best_move
+        if self._level == AILevel.MCTS and self._workers > 1:
+            if self._parallel_search is None:
+                self._parallel_search = parallel.RootParallelSearch(self._workers)
+            statistics, self._last_search_stats = self._parallel_search.search(
+                game,
+                iterations=self._iterations,
+                time_budget=self._time_budget,
+                rng=self._rng,
+            )
+            return parallel.best_move(statistics, possible_moves)
+        if self._level == AILevel.MCTS:
+            root, self._last_search_stats = mcts.search(
+                game,
+                iterations=self._iterations,
+                time_budget=self._time_budget,
+                rng=self._rng,
+            )
+            return mcts.best_move(root, possible_moves)
+        if self._level == AILevel.EXPECTIMAX:
+            if self._table is None:
+                self._table = transposition.TranspositionTable(
+                    self._table_size, self._table_policy
+                )
+            move, self._last_search_stats = expectimax.search(
+                game,
+                depth=self._depth,
+                time_budget=self._time_budget,
+                rng=self._rng,
+                table=self._table,
+            )
+            return move
+        scores = AIPlayer.evaluate_moves(
+            possible_moves, self.color, self._level.value, game.board
+        )
+        # le premier des meilleurs coups, comme `max` avec `evaluate_move_fn`
+        return possible_moves[int(numpy.argmax(scores))]
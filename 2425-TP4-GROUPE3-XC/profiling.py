@@ -0,0 +1,128 @@
+import dataclasses
+import functools
+import time
+
+"""
+This module provides per-phase profiling counters: the instrumented methods
+(see `profiled`) count their calls and accumulate their wall-clock duration
+into the `Profiler` of their game, which is switched on and off at runtime
+(see `Profiler.enabled`) and reads as a per-game report.
+
+Durations are inclusive: e.g. the duration of `AIPlayer.play` includes the
+move generations and placements done by the search, which are counted in their
+own phases too.
+"""
+
+
+@dataclasses.dataclass(frozen=True)
+class PhaseStats:
+    """
+    The counters of a phase: number of calls, and total duration in seconds.
+    """
+
+    calls: int
+    seconds: float
+
+    @property
+    def mean(self):
+        return self.seconds / self.calls if self.calls > 0 else 0.0
+
+
+class Profiler:
+    """
+    The counters of the phases of a game, keyed by phase name. Nothing is
+    recorded while the profiler is disabled, so that an instrumented method
+    then only costs one attribute check.
+    """
+
+    __slots__ = ("enabled", "_calls", "_seconds")
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._calls = {}
+        self._seconds = {}
+
+    def record(self, phase, seconds, calls=1):
+        """
+        Add `calls` calls lasting `seconds` seconds in total to the counters of
+        `phase`.
+        """
+        self._calls[phase] = self._calls.get(phase, 0) + calls
+        self._seconds[phase] = self._seconds.get(phase, 0.0) + seconds
+
+    def reset(self):
+        """
+        Clear all the counters.
+        """
+        self._calls.clear()
+        self._seconds.clear()
+
+    def merge(self, other):
+        """
+        Add the counters of the `Profiler` `other` to these ones, e.g. to
+        aggregate the games of a batch.
+        """
+        for phase, stats in other.stats().items():
+            self.record(phase, stats.seconds, stats.calls)
+
+    def stats(self):
+        """
+        Return the dictionary mapping the phase names to their `PhaseStats`.
+        """
+        return {
+            phase: PhaseStats(calls, self._seconds[phase])
+            for phase, calls in self._calls.items()
+        }
+
+    def report(self, total_phase="Game.play"):
+        """
+        Return a human-readable table of the counters, slowest phase first, as
+        a string; the share of each phase is relative to `total_phase` if it
+        was recorded.
+        """
+        stats = self.stats()
+        if not stats:
+            return "no profiling data"
+        total = stats.get(total_phase, PhaseStats(0, 0.0)).seconds
+        lines = [
+            f"{'phase':<24}{'calls':>10}{'total (s)':>12}{'mean (us)':>12}"
+            f"{'share':>8}"
+        ]
+        for phase, phase_stats in sorted(
+            stats.items(), key=lambda item: item[1].seconds, reverse=True
+        ):
+            share = f"{phase_stats.seconds / total:.1%}" if total > 0 else "-"
+            lines.append(
+                f"{phase:<24}{phase_stats.calls:>10}{phase_stats.seconds:>12.4f}"
+                f"{phase_stats.mean * 1e6:>12.2f}{share:>8}"
+            )
+        return "\n".join(lines)
+
+
+def _instance_profiler(instance, *args, **kwargs):
+    return instance.profiler
+
+
+def profiled(phase, profiler_of=_instance_profiler):
+    """
+    Decorate a method so that its calls are counted and timed in the phase
+    `phase` of the profiler returned by `profiler_of` (called with the
+    arguments of the method; by default, the `profiler` attribute of the
+    instance), when there is one and it is enabled.
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            profiler = profiler_of(*args, **kwargs)
+            if profiler is None or not profiler.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.record(phase, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,251 @@
+import board
+import dataclasses
+import deck
+import game
+import json
+import player
+import struct
+
+"""
+This module defines a compact record of a game, from which any intermediate
+state of the game can be rebuilt (see `replay`), e.g. to archive simulated
+games and to reload specific positions for analysis.
+
+A record holds the colors of the players, their initial number of pawns, the
+order of the deck, i.e. the tiles in the order they were drawn (the first one
+being placed at the start of the game) followed by the tiles left, and one
+`(row, column, rotation)` entry per move, the position being in absolute
+coordinates (see `board.Board.to_absolute`) and the rotation in degrees,
+relative to the drawn tile (see `board.Move`).
+
+Records are stored either in binary form (see `write_binary` and
+`read_binary`), or as JSON lines (see `write_jsonl` and `read_jsonl`); both
+are streams of records, which may thus be appended to a file one at a time.
+
+In binary form, each record is made of:
+- a header: magic number, number of players, initial number of pawns, size
+  in bytes of the tiles, and number of moves;
+- the color code (see `player.COLOR_CODE`) of each player, on one byte;
+- the tiles, in compiled form (see `deck.compile_tiles`);
+- the moves, each coded on `_MOVE.size` bytes (row and column as signed
+  16-bit integers, and number of quarter turns).
+All the integers are little-endian.
+
+As JSON lines, each record is an object on a single line, with the keys
+`players` (color names), `pawns`, `tiles` (the distinct tiles, as lines of a
+deck file, see `deck.encode_line`), `draws` (the index of each drawn tile in
+`tiles`) and `moves` (`[row, column, rotation]` lists).
+"""
+
+
+_MAGIC = b"MFCGAME1"
+_HEADER = struct.Struct("<8sBBII")
+_MOVE = struct.Struct("<hhB")
+_COLORS = {code: color for color, code in player.COLOR_CODE.items()}
+
+
+@dataclasses.dataclass(frozen=True)
+class GameRecord:
+    """
+    The record of a game (see above): `colors` and `tiles` are tuples of
+    `player.Color` and of (shared) `tile.Tile`, and `moves` a tuple of
+    `(row, column, rotation)` triples.
+    """
+
+    colors: tuple
+    num_pawns: int
+    tiles: tuple
+    moves: tuple
+
+    @property
+    def num_moves(self):
+        return len(self.moves)
+
+    @classmethod
+    def from_game(cls, game_state, num_pawns=game.NUM_PAWNS):
+        """
+        Return the record of the moves played so far in `game_state`, whose
+        players started with `num_pawns` pawns. The tiles not drawn yet follow
+        the drawn ones, in their order in the deck.
+        """
+        return cls(
+            colors=tuple(player_.color for player_ in game_state.players),
+            num_pawns=num_pawns,
+            tiles=(*game_state.drawn_tiles(), *game_state.deck),
+            moves=tuple(game_state.moves_played()),
+        )
+
+    def to_bytes(self):
+        """
+        Return the binary form of the record, as `bytes`.
+        """
+        tiles = deck.compile_tiles(self.tiles)
+        try:
+            moves = [
+                _MOVE.pack(row, column, rotation // 90)
+                for row, column, rotation in self.moves
+            ]
+        except struct.error:
+            raise ValueError("move out of the range of the binary form")
+        return b"".join(
+            [
+                _HEADER.pack(
+                    _MAGIC, len(self.colors), self.num_pawns, len(tiles), len(moves)
+                ),
+                bytes(player.COLOR_CODE[color] for color in self.colors),
+                tiles,
+            ]
+            + moves
+        )
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """
+        Decode the record in binary form starting at `offset` in `data`, and
+        return it along with the offset of its end. Raises `ValueError` if the
+        data is not a valid binary record.
+        """
+        if len(data) < offset + _HEADER.size:
+            raise ValueError("truncated game record")
+        magic, num_players, num_pawns, tiles_size, num_moves = _HEADER.unpack_from(
+            data, offset
+        )
+        if magic != _MAGIC:
+            raise ValueError("invalid game record")
+        colors_start = offset + _HEADER.size
+        tiles_start = colors_start + num_players
+        moves_start = tiles_start + tiles_size
+        end = moves_start + num_moves * _MOVE.size
+        if len(data) < end:
+            raise ValueError("truncated game record")
+        try:
+            colors = tuple(_COLORS[code] for code in data[colors_start:tiles_start])
+        except KeyError:
+            raise ValueError("invalid color in game record")
+        tiles = deck.decompile_tiles(data[tiles_start:moves_start])
+        moves = tuple(
+            (row, column, quarter_turns * 90)
+            for row, column, quarter_turns in _MOVE.iter_unpack(data[moves_start:end])
+        )
+        return cls(colors, num_pawns, tuple(tiles), moves), end
+
+    def to_json(self):
+        """
+        Return the JSON-serializable form of the record (see above).
+        """
+        indices = {}
+        distinct = []
+        draws = []
+        for tile_ in self.tiles:
+            line = deck.encode_line(tile_)
+            index = indices.get(line)
+            if index is None:
+                index = indices[line] = len(distinct)
+                distinct.append(line)
+            draws.append(index)
+        return {
+            "players": [color.value for color in self.colors],
+            "pawns": self.num_pawns,
+            "tiles": distinct,
+            "draws": draws,
+            "moves": [list(move) for move in self.moves],
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Decode the JSON-serializable form of a record (see `to_json`). Raises
+        `ValueError` if the data is not a valid record (`deck.InvalidFormat`
+        for an invalid tile).
+        """
+        try:
+            colors = tuple(player.Color(name) for name in data["players"])
+            distinct = [
+                deck.decode_line(line_num, line)
+                for line_num, line in enumerate(data["tiles"], start=1)
+            ]
+            return cls(
+                colors=colors,
+                num_pawns=int(data["pawns"]),
+                tiles=tuple(distinct[index] for index in data["draws"]),
+                moves=tuple(
+                    (int(row), int(column), int(rotation))
+                    for row, column, rotation in data["moves"]
+                ),
+            )
+        except (KeyError, IndexError, TypeError) as error:
+            raise ValueError(f"invalid game record ({error!r})")
+
+
+def write_binary(file, records):
+    """
+    Write the binary form of the passed records to the binary `file`.
+    """
+    for record_ in records:
+        file.write(record_.to_bytes())
+
+
+def read_binary(file):
+    """
+    Generate the records read from the binary `file` (see `write_binary`).
+    Raises `ValueError` if the file holds an invalid record.
+    """
+    data = file.read()
+    offset = 0
+    while offset < len(data):
+        record_, offset = GameRecord.from_bytes(data, offset)
+        yield record_
+
+
+def write_jsonl(file, records):
+    """
+    Write the passed records to the text `file`, one JSON object per line.
+    """
+    for record_ in records:
+        file.write(json.dumps(record_.to_json(), separators=(",", ":")))
+        file.write("\n")
+
+
+def read_jsonl(file):
+    """
+    Generate the records read from the text `file` (see `write_jsonl`).
+    Raises `ValueError` if the file holds an invalid record.
+    """
+    for line in file:
+        if line.strip():
+            yield GameRecord.from_json(json.loads(line))
+
+
+def replay(record_, num_moves=None, array_mode=False):
+    """
+    Rebuild the game of `record_` after its first `num_moves` moves (by
+    default, all of them), and return it. The moves are done without players
+    nor checks (see `game.Game.do_move`): the players of the returned game
+    are plain `player.Player`, and its deck is drawn in the recorded order.
+    """
+    if num_moves is None:
+        num_moves = record_.num_moves
+    assert 0 <= num_moves <= record_.num_moves, "invalid num_moves"
+    game_state = game.Game(
+        players=[player.Player(color, record_.num_pawns) for color in record_.colors],
+        deck_path=None,
+        array_mode=array_mode,
+        tiles=record_.tiles,
+    )
+    board_ = game_state.board
+    for row, column, rotation in record_.moves[:num_moves]:
+        game_state.do_move(board.Move(board_.to_relative(row, column), rotation))
+    return game_state
+
+
+def positions(record_):
+    """
+    Generate the successive states of the game of `record_`, from its start
+    to its end, as a single game updated in place between two states.
+    """
+    game_state = replay(record_, 0)
+    board_ = game_state.board
+    yield game_state
+    for row, column, rotation in record_.moves:
+        game_state.do_move(board.Move(board_.to_relative(row, column), rotation))
+        yield game_state
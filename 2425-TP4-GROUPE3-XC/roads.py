@@ -0,0 +1,196 @@
+import dataclasses
+import player
+
+from tile import OPPOSITE_SIDE, SIDE_DELTAS
+
+"""
+This module tracks the roads drawn by the links of the placed tiles, in order
+to detect incrementally when a road becomes closed.
+
+A road is a sequence of links of the same color, joined across the sides of
+neighbouring tiles. Each end of a road is either *open* (the neighbouring cell
+is empty, so the road may still be extended) or *dead* (the neighbouring tile
+has no link of the same color on that side). A road is closed when it has no
+open end, which covers both loops and roads whose two ends are dead.
+"""
+
+
+# The kinds of entries of the journal of a `RoadNetwork`.
+_LINK = 0
+_OPEN_ENDS = 1
+_UNION = 2
+
+
+@dataclasses.dataclass(frozen=True)
+class ClosedRoad:
+    """
+    A road that has just been closed, identified by its color and its number
+    of links (i.e. the number of tiles it goes through, counting a tile twice
+    if the road goes through it twice).
+    """
+
+    color: player.Color
+    num_links: int
+
+
+class RoadNetwork:
+    """
+    Disjoint sets over the road endpoints of the placed tiles, an endpoint
+    being an absolute `(row, column, side)` triple. Each set is a road, whose
+    root endpoint carries the color, the number of links and the number of
+    open ends of the road.
+
+    Sets are merged by size, which keeps every tree O(log n) deep; placing a
+    tile therefore only performs a handful of `find` calls, independently of
+    the length of the roads it extends. As paths are never compressed, every
+    change is recorded in a journal and can be undone with `rollback`.
+    """
+
+    def __init__(self, cells):
+        """
+        Create an empty network, reading the tiles from `cells`, the dictionary
+        of placed tiles (indexed by absolute `(row, column)` coordinates) owned
+        by the board.
+        """
+        self._cells = cells
+        self._parent = {}
+        self._size = {}
+        self._color = {}
+        self._num_links = {}
+        self._open_ends = {}
+        self._journal = []
+
+    def find(self, endpoint):
+        """
+        Return the root endpoint of the road containing `endpoint`.
+        """
+        parent = self._parent
+        while parent[endpoint] != endpoint:
+            endpoint = parent[endpoint]
+        return endpoint
+
+    def __contains__(self, endpoint):
+        return endpoint in self._parent
+
+    def _union(self, first, second):
+        """
+        Merge the roads whose roots are passed, returning the new root.
+        """
+        if first == second:
+            return first
+        if self._size[first] < self._size[second]:
+            first, second = second, first
+        self._journal.append(
+            (
+                _UNION,
+                first,
+                second,
+                self._size[second],
+                self._num_links[second],
+                self._open_ends[second],
+                self._color[second],
+            )
+        )
+        self._parent[second] = first
+        self._size[first] += self._size.pop(second)
+        self._num_links[first] += self._num_links.pop(second)
+        self._open_ends[first] += self._open_ends.pop(second)
+        del self._color[second]
+        return first
+
+    def _add_open_ends(self, root, delta):
+        self._open_ends[root] += delta
+        self._journal.append((_OPEN_ENDS, root, delta))
+
+    def checkpoint(self):
+        """
+        Return a mark identifying the current state of the network, to be
+        passed to `rollback`.
+        """
+        return len(self._journal)
+
+    def rollback(self, mark):
+        """
+        Undo all the changes made since `checkpoint` returned `mark`.
+        """
+        journal = self._journal
+        while len(journal) > mark:
+            entry = journal.pop()
+            kind = entry[0]
+            if kind == _OPEN_ENDS:
+                self._open_ends[entry[1]] -= entry[2]
+            elif kind == _UNION:
+                _, first, second, size, num_links, open_ends, color = entry
+                self._parent[second] = second
+                self._size[first] -= size
+                self._size[second] = size
+                self._num_links[first] -= num_links
+                self._num_links[second] = num_links
+                self._open_ends[first] -= open_ends
+                self._open_ends[second] = open_ends
+                self._color[second] = color
+            else:
+                _, root, other = entry
+                del self._parent[root]
+                del self._parent[other]
+                del self._size[root]
+                del self._color[root]
+                del self._num_links[root]
+                del self._open_ends[root]
+
+    def is_closed(self, endpoint):
+        """
+        Return whether the road containing `endpoint` is closed.
+        """
+        return self._open_ends[self.find(endpoint)] == 0
+
+    def add_tile(self, row, column, tile):
+        """
+        Register the links of `tile`, which has just been placed at the passed
+        absolute coordinates, and return the list of `ClosedRoad` instances for
+        the roads closed by this placement (either going through the tile, or
+        ending against it).
+        """
+        cells = self._cells
+        candidates = []
+        for link in tile.links:
+            first, second = link.sides
+            root = (row, column, first)
+            self._parent[root] = root
+            self._parent[(row, column, second)] = root
+            self._size[root] = 2
+            self._color[root] = link.color
+            self._num_links[root] = 1
+            self._open_ends[root] = 0
+            self._journal.append((_LINK, root, (row, column, second)))
+            candidates.append(root)
+        for side, (delta_row, delta_column) in SIDE_DELTAS.items():
+            link = tile.get_link(side)
+            neighbour = cells.get((row + delta_row, column + delta_column))
+            if neighbour is None:
+                if link is not None:
+                    self._add_open_ends(self.find((row, column, side)), 1)
+                continue
+            opposite = OPPOSITE_SIDE[side]
+            neighbour_link = neighbour.get_link(opposite)
+            if neighbour_link is None:
+                continue
+            # this end of the neighbouring road was facing an empty cell
+            neighbour_root = self.find(
+                (row + delta_row, column + delta_column, opposite)
+            )
+            self._add_open_ends(neighbour_root, -1)
+            if link is not None and link.color == neighbour_link.color:
+                neighbour_root = self._union(
+                    self.find((row, column, side)), neighbour_root
+                )
+            candidates.append(neighbour_root)
+        closed = []
+        seen = set()
+        for candidate in candidates:
+            root = self.find(candidate)
+            if root not in seen:
+                seen.add(root)
+                if self._open_ends[root] == 0:
+                    closed.append(ClosedRoad(self._color[root], self._num_links[root]))
+        return closed
@@ -0,0 +1,542 @@
+import asyncio
+import concurrent.futures
+import deck
+import events
+import game
+import itertools
+import player
+import simulation
+
+"""
+This module is an asyncio-based server hosting many concurrent games over TCP,
+where remote players submit their moves with a line protocol, while the other
+players are played by the server (their moves being chosen in a pool of
+processes, so that neither the event loop nor the other games wait for them).
+
+Each line is made of space-separated words, the first one being a command.
+The client sends:
+- `NEW <line-up> [<seed>]` to create a game, whose line-up is as described in
+  `simulation`, with `remote` seats for remote players; the client takes the
+  first remote seat, the other ones being open to other clients (a line-up
+  made of a single `remote` seat is a solo game, started at once);
+- `JOIN <game>` to take the next open seat of a game;
+- `LIST` to list the games with open seats;
+- `MOVE <index>` to play the move of index `index` in the last `PLAY` line;
+- `QUIT` to leave (the seats of the client are then played as timed out).
+
+The server sends:
+- `HELLO mfc <version>` on connection;
+- `JOINED <game> <seat> <color>` once a seat is taken;
+- `GAMES <game>:<open seats> ...` in reply to `LIST`;
+- `STARTED <game> <colors>` once all the seats are taken, the colors being
+  comma-separated in the order of the seats;
+- `TURN <color> <tile>` at each turn, the tile being the rest of the line,
+  encoded as a line of a deck file (see `deck.encode_line`, and
+  `deck.decode_line` to decode it), which holds spaces;
+- `PLAY <timeout> <row>:<column>:<rotation> ...` to the player to move, with
+  the possible moves (positions being absolute, see
+  `board.Board.to_absolute`, and rotations in degrees) and the number of
+  seconds left to choose one;
+- `TIMEOUT` if no move was chosen in time, the first possible move being
+  played instead;
+- `PLACED <color> <row> <column> <rotation>`, `CLOSED <color> <links>` and
+  `PAWNS <color> <placed> <left>` as moves are played;
+- `OVER <colors>` once the game is over, with the colors of the winners;
+- `ERROR <message>` if a command is invalid.
+"""
+
+
+PROTOCOL_VERSION = 1
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7777
+
+# The number of pending connections accepted by the server, large enough for
+# hundreds of clients connecting at once.
+BACKLOG = 1024
+
+# The default number of seconds a remote player has to choose a move.
+DEFAULT_MOVE_TIMEOUT = 60.0
+
+# The share of the move timeout which the players of the server spend on
+# their searches (at most `player.DEFAULT_TIME_BUDGET` seconds), the rest
+# covering the copy of the game to a worker process.
+AI_TIME_SHARE = 0.5
+
+# The specification of a remote seat in a line-up.
+REMOTE = "remote"
+
+
+def _play_in_worker(player_, possible_moves, game_state):
+    """
+    Choose the move of `player_` (a copy of a player of the server) in a
+    worker process, and return it along with the state of the random generator
+    of the player, so that the original player draws from where its copy
+    stopped.
+    """
+    move = player_.play(possible_moves, game_state)
+    return move, player_.rng.getstate()
+
+
+class _Connection:
+    """
+    A client connected to the server, taking at most one seat at a time.
+    """
+
+    def __init__(self, writer):
+        self._writer = writer
+        self.seat = None
+
+    def send(self, *words):
+        if not self._writer.is_closing():
+            self._writer.write((" ".join(map(str, words)) + "\n").encode())
+
+    def close(self):
+        self._writer.close()
+
+    async def drain(self):
+        if not self._writer.is_closing():
+            await self._writer.drain()
+
+
+class RemotePlayer(player.Player):
+    """
+    A player whose moves are submitted through a connection to the server.
+    As waiting for a move must not block the process, the moves are asked for
+    by the coroutine `choose`, `play` giving the move played when none is
+    submitted.
+    """
+
+    __slots__ = ("_connection", "_pending")
+
+    def __init__(self, color, num_pawns, connection):
+        super().__init__(color, num_pawns)
+        self._connection = connection
+        self._pending = None
+
+    def __str__(self):
+        return f"remote ({self.color.value})"
+
+    def __getstate__(self):
+        # the connection stays with the server, copies of the game (sent to
+        # the workers) only need the color and pawns of the player
+        state = {
+            name: getattr(self, name)
+            for cls in type(self).__mro__
+            for name in getattr(cls, "__slots__", ())
+        }
+        state["_connection"] = None
+        state["_pending"] = None
+        return state
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    @property
+    def connected(self):
+        return self._connection is not None
+
+    def send(self, *words):
+        if self._connection is not None:
+            self._connection.send(*words)
+
+    def play(self, possible_moves, game=None):
+        """
+        Return the move played for the player when it submits none in time or
+        is disconnected: the first possible move.
+        """
+        return possible_moves[0]
+
+    async def choose(self, possible_moves, game_state, timeout):
+        """
+        Send `possible_moves` (of `game_state`) to the client, and return the
+        move it submits (see `submit`) within `timeout` seconds, or `None` if
+        it does not or is not connected.
+        """
+        if self._connection is None:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self._pending = possible_moves, future
+        board_ = game_state.board
+        self.send(
+            "PLAY",
+            f"{timeout:g}",
+            *(
+                "{}:{}:{}".format(*board_.to_absolute(position), rotation)
+                for position, rotation in possible_moves
+            ),
+        )
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._pending = None
+
+    def submit(self, index):
+        """
+        Submit the move of index `index` among the moves being chosen from,
+        and return `None`, or an error message if there are none or the index
+        is invalid.
+        """
+        if self._pending is None:
+            return "not your turn"
+        possible_moves, future = self._pending
+        if not 0 <= index < len(possible_moves):
+            return "invalid move"
+        if not future.done():
+            future.set_result(possible_moves[index])
+        return None
+
+    def disconnect(self):
+        """
+        Detach the player from its connection, whose seat is released: the
+        move being chosen, if any, and the next ones are then never submitted.
+        """
+        if self._connection is not None and self._connection.seat is self:
+            self._connection.seat = None
+        self._connection = None
+        if self._pending is not None and not self._pending[1].done():
+            self._pending[1].set_result(None)
+
+
+class _Session:
+    """
+    A game hosted by the server: its seats (player specifications), the
+    players of the seats taken so far, and the game once started.
+    """
+
+    def __init__(self, game_id, specifications, seed):
+        self.game_id = game_id
+        self.specifications = specifications
+        self.seed = seed
+        self.players = [None] * len(specifications)
+        self.game = None
+
+    def open_seats(self):
+        return [
+            index
+            for index, (specification, player_) in enumerate(
+                zip(self.specifications, self.players)
+            )
+            if specification[0] == REMOTE and player_ is None
+        ]
+
+    def broadcast(self, *words):
+        for player_ in self.players:
+            if isinstance(player_, RemotePlayer):
+                player_.send(*words)
+
+
+def parse_seats(text):
+    """
+    Return the list of seat specifications of the passed line-up, which may
+    hold `remote` seats (see `simulation.parse_lineup`). Raises `ValueError`
+    if the line-up is invalid or has no remote seat.
+    """
+    items = [item.strip() for item in text.split(",")]
+    if REMOTE not in items:
+        raise ValueError("a line-up should have a remote seat")
+    if len(items) > len(player.Color):
+        raise ValueError(f"a line-up should have 1 to {len(player.Color)} players")
+    others = [item for item in items if item != REMOTE]
+    specifications = iter(simulation.parse_lineup(",".join(others)) if others else [])
+    return [(REMOTE,) if item == REMOTE else next(specifications) for item in items]
+
+
+class GameServer:
+    """
+    A server hosting games between remote players (see `RemotePlayer`) and
+    players of the server, who have `move_timeout` seconds to choose a move.
+    The moves of the players of the server are chosen in `executor` (by
+    default, a pool of processes, to which the game and the player are
+    copied), within a share `AI_TIME_SHARE` of `move_timeout`, and the decks
+    are loaded from `deck_path` (by default, the default deck).
+    """
+
+    def __init__(
+        self, move_timeout=DEFAULT_MOVE_TIMEOUT, executor=None, deck_path=None
+    ):
+        assert move_timeout > 0, "invalid move_timeout"
+        self._move_timeout = move_timeout
+        self._time_budget = min(
+            player.DEFAULT_TIME_BUDGET, move_timeout * AI_TIME_SHARE
+        )
+        self._own_executor = executor is None
+        self._executor = (
+            concurrent.futures.ProcessPoolExecutor() if executor is None else executor
+        )
+        self._deck_path = deck_path
+        self._sessions = {}
+        self._game_ids = itertools.count(1)
+        self._tasks = set()
+        # the task handling each connection
+        self._connections = {}
+        self._server = None
+
+    @property
+    def num_games(self):
+        """
+        The number of games hosted, started or not.
+        """
+        return len(self._sessions)
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Start listening on the passed address (any free port if `port` is 0),
+        and return the `asyncio.Server`.
+        """
+        self._server = await asyncio.start_server(
+            self._handle_connection, host, port, backlog=BACKLOG
+        )
+        return self._server
+
+    async def close(self):
+        """
+        Stop listening, cancel the games in progress, close the connections,
+        and shut the executor down if it was created by the server.
+        """
+        if self._server is not None:
+            self._server.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for connection in self._connections:
+            connection.close()
+        await asyncio.gather(*self._connections.values(), return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+            self._server = None
+        if self._own_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_connection(self, reader, writer):
+        connection = _Connection(writer)
+        self._connections[connection] = asyncio.current_task()
+        connection.send("HELLO", "mfc", PROTOCOL_VERSION)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    break
+                if not line:
+                    break
+                words = line.decode(errors="replace").split()
+                if not words:
+                    continue
+                if words[0].upper() == "QUIT":
+                    break
+                error = self._dispatch(connection, words)
+                if error is not None:
+                    connection.send("ERROR", error)
+                await connection.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self._connections[connection]
+            self._leave(connection)
+            writer.close()
+
+    def _dispatch(self, connection, words):
+        """
+        Execute the command of `words` for `connection`, and return `None`, or
+        an error message.
+        """
+        command, arguments = words[0].upper(), words[1:]
+        match command, arguments:
+            case "NEW", [lineup] | [lineup, _]:
+                if connection.seat is not None:
+                    return "already in a game"
+                try:
+                    specifications = parse_seats(lineup)
+                except ValueError as error:
+                    return str(error)
+                try:
+                    seed = int(arguments[1]) if len(arguments) == 2 else None
+                except ValueError:
+                    return "invalid seed"
+                session = _Session(next(self._game_ids), specifications, seed)
+                self._sessions[session.game_id] = session
+                self._join(connection, session)
+            case "JOIN", [game_id]:
+                if connection.seat is not None:
+                    return "already in a game"
+                session = (
+                    self._sessions.get(int(game_id)) if game_id.isdigit() else None
+                )
+                if session is None or not session.open_seats():
+                    return "no such game with an open seat"
+                self._join(connection, session)
+            case "LIST", []:
+                connection.send(
+                    "GAMES",
+                    *(
+                        f"{session.game_id}:{len(session.open_seats())}"
+                        for session in self._sessions.values()
+                        if session.open_seats()
+                    ),
+                )
+            case "MOVE", [index]:
+                if connection.seat is None:
+                    return "not in a game"
+                if not index.isdigit():
+                    return "invalid move"
+                return connection.seat.submit(int(index))
+            case _:
+                return f"invalid command ({' '.join(words)})"
+        return None
+
+    def _join(self, connection, session):
+        """
+        Seat `connection` at the next open seat of `session`, and start the
+        game once all the seats are taken.
+        """
+        index = session.open_seats()[0]
+        color = list(player.Color)[index]
+        connection.seat = session.players[index] = RemotePlayer(
+            color, game.NUM_PAWNS, connection
+        )
+        connection.send("JOINED", session.game_id, index, color.value)
+        if not session.open_seats():
+            task = asyncio.get_running_loop().create_task(self._run(session))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _leave(self, connection):
+        """
+        Release the seat of `connection`: the seat of a game not started yet
+        opens again (the game being dropped if no remote player is left), and
+        the turns of a started game are played as timed out.
+        """
+        seat, connection.seat = connection.seat, None
+        if seat is None:
+            return
+        seat.disconnect()
+        for session in list(self._sessions.values()):
+            if session.game is None and seat in session.players:
+                session.players[session.players.index(seat)] = None
+                if not any(session.players):
+                    del self._sessions[session.game_id]
+
+    async def _run(self, session):
+        """
+        Play the game of `session` to its end, sending its progress to its
+        remote players.
+        """
+        for index, specification in enumerate(session.specifications):
+            if specification[0] != REMOTE:
+                session.players[index] = simulation.make_player(
+                    specification,
+                    list(player.Color)[index],
+                    seed=(
+                        simulation.derive_seed(session.seed, "player", index)
+                        if session.seed is not None
+                        else None
+                    ),
+                    time_budget=self._time_budget,
+                )
+        game_state = session.game = game.Game(
+            players=session.players,
+            deck_path=self._deck_path,
+            seed=(
+                simulation.derive_seed(session.seed, "deck")
+                if session.seed is not None
+                else None
+            ),
+        )
+        _Broadcaster(session).subscribe(game_state.events)
+        session.broadcast(
+            "STARTED",
+            session.game_id,
+            ",".join(player_.color.value for player_ in session.players),
+        )
+        loop = asyncio.get_running_loop()
+        try:
+            while not game_state.is_over():
+                player_ = game_state.current_player()
+                possible_moves = game_state.get_possible_moves()
+                session.broadcast(
+                    "TURN",
+                    player_.color.value,
+                    deck.encode_line(game_state.current_tile()),
+                )
+                if isinstance(player_, RemotePlayer):
+                    move = await player_.choose(
+                        possible_moves, game_state, self._move_timeout
+                    )
+                    if move is None:
+                        player_.send("TIMEOUT")
+                        move = player_.play(possible_moves, game_state)
+                else:
+                    move, rng_state = await loop.run_in_executor(
+                        self._executor,
+                        _play_in_worker,
+                        player_,
+                        possible_moves,
+                        game_state,
+                    )
+                    player_.rng.setstate(rng_state)
+                game_state.apply_move(move)
+            session.broadcast(
+                "OVER",
+                ",".join(winner.color.value for winner in game_state.winners()),
+            )
+        finally:
+            self._sessions.pop(session.game_id, None)
+            for player_ in session.players:
+                if isinstance(player_, RemotePlayer):
+                    player_.disconnect()
+                elif isinstance(player_, player.AIPlayer):
+                    player_.close()
+
+
+class _Broadcaster:
+    """
+    An observer sending the moves of a game to its remote players.
+    """
+
+    def __init__(self, session):
+        self._session = session
+
+    def subscribe(self, bus):
+        bus.subscribe(events.TilePlaced, self.on_tile_placed)
+        bus.subscribe(events.PathClosed, self.on_path_closed)
+        bus.subscribe(events.PawnPlaced, self.on_pawn_placed)
+
+    def on_tile_placed(self, event):
+        # the position of the event is relative to the board before the move
+        row, column, rotation = self._session.game.moves_played()[-1]
+        self._session.broadcast(
+            "PLACED", event.player.color.value, row, column, rotation
+        )
+
+    def on_path_closed(self, event):
+        self._session.broadcast("CLOSED", event.road.color.value, event.road.num_links)
+
+    def on_pawn_placed(self, event):
+        self._session.broadcast(
+            "PAWNS",
+            event.player.color.value,
+            event.num_pawns,
+            event.num_pawns_left,
+        )
+
+
+async def serve(
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    move_timeout=DEFAULT_MOVE_TIMEOUT,
+    deck_path=None,
+):
+    """
+    Run a `GameServer` on the passed address until cancelled.
+    """
+    game_server = GameServer(move_timeout=move_timeout, deck_path=deck_path)
+    server = await game_server.start(host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await game_server.close()
@@ -0,0 +1,430 @@
+import concurrent.futures
+import dataclasses
+import game
+import os
+import player
+import profiling
+import random
+import record
+import time
+
+"""
+This module plays complete games without any human player and without any
+output (headless self-play), and aggregates their results, mainly to measure
+the throughput of the engine and to compare AI levels.
+
+A line-up is described by a comma-separated list of player specifications,
+one per seat, the colors being assigned in the order of `player.Color`:
+- `random` for a `player.RandomPlayer`;
+- `ai:<level>` for a `player.AIPlayer` of the passed level (`easy`, `hard`,
+  `mcts`, `expectimax`), optionally followed by `:<iterations>` for the
+  `mcts` level, or by `:<depth>` for the `expectimax` level. The searches of
+  these players have no time budget, so that the games are reproducible (see
+  `make_player`).
+
+The games of a batch may be spread over a pool of processes (see
+`BatchRunner`); each game is seeded from the seed of the batch and its index
+(see `game_seed`), so that its result does not depend on the number of
+processes.
+"""
+
+
+def parse_lineup(text):
+    """
+    Return the list of player specifications of the passed line-up, each
+    specification being a tuple of its colon-separated parts. Raises
+    `ValueError` if the line-up is invalid.
+    """
+    specifications = [
+        tuple(part.strip() for part in item.split(":")) for item in text.split(",")
+    ]
+    if not 1 <= len(specifications) <= len(player.Color):
+        raise ValueError(f"a line-up should have 1 to {len(player.Color)} players")
+    for specification in specifications:
+        match specification:
+            case ("random",):
+                pass
+            case ("ai", level) | ("ai", level, _):
+                try:
+                    player.AILevel(level)
+                except ValueError:
+                    raise ValueError(f"unknown AI level ({level})")
+                if len(specification) == 3 and not (
+                    specification[2].isdigit() and int(specification[2]) > 0
+                ):
+                    raise ValueError(f"invalid iterations ({specification[2]})")
+            case _:
+                raise ValueError(f"invalid player ({':'.join(specification)})")
+    return specifications
+
+
+def derive_seed(seed, *path):
+    """
+    Return the seed derived from `seed` for the stream identified by `path`
+    (e.g. `("player", 1)`), which depends on both and on nothing else, so
+    that the streams of a game are independent from each other and from the
+    order in which games are played.
+    """
+    return random.Random(":".join(map(str, (seed, *path)))).getrandbits(64)
+
+
+def make_player(
+    specification, color, num_pawns=game.NUM_PAWNS, seed=None, time_budget=None
+):
+    """
+    Create a fresh player of the passed color from the passed specification
+    (see `parse_lineup`), with its own random generator seeded with `seed`.
+    The searches of AI players are bounded by `time_budget` seconds per move
+    if passed, and only by their iterations or depth otherwise, so that their
+    moves do not depend on the speed of the machine.
+    """
+    if specification[0] == "random":
+        return player.RandomPlayer(color=color, num_pawns=num_pawns, seed=seed)
+    level = player.AILevel(specification[1])
+    options = {"seed": seed, "time_budget": time_budget}
+    if len(specification) == 3:
+        if level == player.AILevel.EXPECTIMAX:
+            options["depth"] = int(specification[2])
+        else:
+            options["iterations"] = int(specification[2])
+    return player.AIPlayer(color=color, num_pawns=num_pawns, level=level, **options)
+
+
+def make_players(specifications, num_pawns=game.NUM_PAWNS, seed=None):
+    """
+    Create fresh players from the passed specifications (see `parse_lineup`),
+    each with its own random generator derived from `seed` if passed (see
+    `derive_seed`).
+    """
+    return [
+        make_player(
+            specification,
+            color,
+            num_pawns,
+            derive_seed(seed, "player", index) if seed is not None else None,
+        )
+        for index, (specification, color) in enumerate(
+            zip(specifications, player.Color)
+        )
+    ]
+
+
+@dataclasses.dataclass(frozen=True)
+class GameResult:
+    """
+    The result of a game: the indices of the winning seats, the number of
+    moves played, the number of pawns left to each seat, the wall-clock
+    duration of the game in seconds, the `profiling.Profiler` of the game if
+    it was profiled, and its `record.GameRecord` if it was recorded.
+    """
+
+    winners: tuple
+    num_moves: int
+    pawns_left: tuple
+    elapsed: float
+    profiler: profiling.Profiler = None
+    game_record: record.GameRecord = None
+
+
+def game_seed(batch_seed, index):
+    """
+    Return the seed of the game of index `index` of a batch seeded with
+    `batch_seed` (see `derive_seed`).
+    """
+    return derive_seed(batch_seed, "game", index)
+
+
+def play_game(
+    specifications,
+    deck_path=None,
+    profile=False,
+    seed=None,
+    num_pawns=game.NUM_PAWNS,
+    recorded=False,
+):
+    """
+    Play silently a complete game between fresh players built from the passed
+    specifications, with `num_pawns` pawns each, and return its `GameResult`,
+    profiled if `profile` is true (see `game.Game.profiler`). If `seed` is
+    passed, the random generators of the game and of the players are derived
+    from it (see `derive_seed`), so that the game can be replayed. The game
+    is recorded (see `record.GameRecord`) if `recorded` is true.
+    """
+    players = make_players(specifications, num_pawns, seed)
+    start = time.perf_counter()
+    game_state = game.Game(
+        players=players,
+        deck_path=deck_path,
+        profile=profile,
+        seed=derive_seed(seed, "deck") if seed is not None else None,
+    )
+    winners = game_state.play()
+    elapsed = time.perf_counter() - start
+    return GameResult(
+        winners=tuple(players.index(winner) for winner in winners),
+        num_moves=game_state.num_moves,
+        pawns_left=tuple(player_.num_pawns for player_ in players),
+        elapsed=elapsed,
+        profiler=game_state.profiler if profile else None,
+        game_record=(
+            record.GameRecord.from_game(game_state, num_pawns) if recorded else None
+        ),
+    )
+
+
+@dataclasses.dataclass(frozen=True)
+class BatchResult:
+    """
+    The results of a batch of games played by the same line-up, along with
+    the wall-clock duration of the batch in seconds.
+    """
+
+    specifications: list
+    results: list
+    elapsed: float
+
+    @property
+    def labels(self):
+        """
+        The labels of the seats, e.g. `1:ai:hard`.
+        """
+        return [
+            f"{index}:{':'.join(specification)}"
+            for index, specification in enumerate(self.specifications)
+        ]
+
+    @property
+    def num_games(self):
+        return len(self.results)
+
+    @property
+    def num_moves(self):
+        return sum(result.num_moves for result in self.results)
+
+    @property
+    def games_per_second(self):
+        return self.num_games / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def moves_per_second(self):
+        return self.num_moves / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def mean_length(self):
+        return self.num_moves / self.num_games if self.num_games > 0 else 0.0
+
+    def win_rates(self):
+        """
+        Return the share of the games won by each seat (see `wins`).
+        """
+        return [
+            count / self.num_games if self.num_games > 0 else 0.0
+            for count in self.wins()
+        ]
+
+    def mean_pawns_left(self):
+        """
+        Return the mean number of pawns left to each seat at the end of the
+        games.
+        """
+        if self.num_games == 0:
+            return [0.0] * len(self.specifications)
+        return [
+            sum(pawns) / self.num_games
+            for pawns in zip(*(result.pawns_left for result in self.results))
+        ]
+
+    def wins(self):
+        """
+        Return the number of games won by each seat (a game won jointly counts
+        for each of its winners).
+        """
+        counts = [0] * len(self.specifications)
+        for result in self.results:
+            for index in result.winners:
+                counts[index] += 1
+        return counts
+
+    def records(self):
+        """
+        Return the `record.GameRecord` of the recorded games of the batch, in
+        order.
+        """
+        return [
+            game_result.game_record
+            for game_result in self.results
+            if game_result.game_record is not None
+        ]
+
+    def profiler(self):
+        """
+        Return the `profiling.Profiler` aggregating the counters of the
+        profiled games of the batch.
+        """
+        result = profiling.Profiler()
+        for game_result in self.results:
+            if game_result.profiler is not None:
+                result.merge(game_result.profiler)
+        return result
+
+    def report(self):
+        """
+        Return a human-readable summary of the batch, as a string.
+        """
+        lines = [
+            f"{self.num_games} games, {self.num_moves} moves in {self.elapsed:.3f} s",
+            f"{self.games_per_second:.1f} games/s, "
+            f"{self.moves_per_second:.1f} moves/s",
+            f"mean game length: {self.mean_length:.1f} moves",
+        ]
+        for label, count, pawns in zip(
+            self.labels, self.wins(), self.mean_pawns_left()
+        ):
+            lines.append(f"{label}: {count} win(s), {pawns:.1f} pawns left")
+        return "\n".join(lines)
+
+    def to_json(self):
+        """
+        Return the aggregated results of the batch, as a JSON-serializable
+        dictionary.
+        """
+        return {
+            "lineup": ",".join(map(":".join, self.specifications)),
+            "games": self.num_games,
+            "moves": self.num_moves,
+            "elapsed": self.elapsed,
+            "games_per_second": self.games_per_second,
+            "moves_per_second": self.moves_per_second,
+            "mean_length": self.mean_length,
+            "seats": [
+                {
+                    "label": label,
+                    "wins": count,
+                    "win_rate": rate,
+                    "mean_pawns_left": pawns,
+                }
+                for label, count, rate, pawns in zip(
+                    self.labels,
+                    self.wins(),
+                    self.win_rates(),
+                    self.mean_pawns_left(),
+                )
+            ],
+        }
+
+
+def run_batch(
+    specifications,
+    num_games,
+    deck_path=None,
+    profile=False,
+    seed=None,
+    recorded=False,
+):
+    """
+    Play silently `num_games` complete games between the passed line-up (see
+    `parse_lineup`), profiled if `profile` is true and recorded if `recorded`
+    is true, and return their `BatchResult`. If `seed` is passed, the games
+    are seeded from it (see `game_seed`).
+    """
+    assert num_games >= 0, "invalid num_games"
+    start = time.perf_counter()
+    results = [
+        play_game(
+            specifications,
+            deck_path,
+            profile,
+            game_seed(seed, index) if seed is not None else None,
+            recorded=recorded,
+        )
+        for index in range(num_games)
+    ]
+    return BatchResult(specifications, results, time.perf_counter() - start)
+
+
+def _play_game_in_worker(arguments):
+    """
+    Play a game in a worker process (see `play_game`, whose arguments are
+    packed into a tuple), and return its `GameResult`.
+    """
+    return play_game(*arguments)
+
+
+class BatchRunner:
+    """
+    A runner of batches spreading their games over a pool of `num_jobs`
+    processes (by default, one per core).
+
+    The pool is created on the first batch and reused by the next ones, so
+    that the workers stay warm (modules imported, decks loaded).
+    """
+
+    def __init__(self, num_jobs=None):
+        self._num_jobs = num_jobs if num_jobs is not None else os.cpu_count()
+        assert self._num_jobs > 0, "invalid num_jobs"
+        self._executor = None
+
+    @property
+    def num_jobs(self):
+        return self._num_jobs
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self._num_jobs
+            )
+        return self._executor
+
+    def run(
+        self,
+        specifications,
+        num_games,
+        deck_path=None,
+        profile=False,
+        seed=0,
+        recorded=False,
+    ):
+        """
+        Same as `run_batch`, the games being seeded from `seed` and spread over
+        the pool (played in the current process if there is only one job). The
+        results are listed in the order of the games.
+        """
+        if self._num_jobs == 1:
+            return run_batch(
+                specifications, num_games, deck_path, profile, seed, recorded
+            )
+        assert num_games >= 0, "invalid num_games"
+        start = time.perf_counter()
+        arguments = [
+            (
+                specifications,
+                deck_path,
+                profile,
+                game_seed(seed, index),
+                game.NUM_PAWNS,
+                recorded,
+            )
+            for index in range(num_games)
+        ]
+        results = list(
+            self._get_executor().map(
+                _play_game_in_worker,
+                arguments,
+                chunksize=max(1, num_games // (4 * self._num_jobs)),
+            )
+        )
+        return BatchResult(specifications, results, time.perf_counter() - start)
+
+    def close(self):
+        """
+        Shut the pool of processes down; a later batch starts a new one.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
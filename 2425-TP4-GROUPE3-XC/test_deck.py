@@ -0,0 +1,52 @@
+import deck
+import hashlib
+
+"""
+Tests of the in-memory cache of `deck.load_tiles`.
+"""
+
+
+def write_decks(directory, count):
+    """
+    Write `count` deck files with distinct contents into `directory`, and
+    return their paths.
+    """
+    lines = [deck.encode_line(tile_) for tile_ in deck.make_tiles()]
+    paths = []
+    for index in range(count):
+        path = directory / f"deck-{index}.deck"
+        path.write_text("\n".join(lines[: index + 1]) + "\n")
+        paths.append(str(path))
+    return paths
+
+
+def test_cache_is_bounded(tmp_path):
+    deck.clear_cache()
+    paths = write_decks(tmp_path, deck.MAX_LOADED_DECKS + 4)
+    for index, path in enumerate(paths):
+        assert len(deck.load_tiles(path)) == index + 1
+        assert len(deck._loaded_decks) <= deck.MAX_LOADED_DECKS
+    deck.clear_cache()
+    assert len(deck._loaded_decks) == 0
+    # the compiled forms stay on disk
+    assert len(deck.load_tiles(paths[0])) == 1
+
+
+def test_least_recently_used_is_evicted(tmp_path):
+    deck.clear_cache()
+    paths = write_decks(tmp_path, deck.MAX_LOADED_DECKS + 1)
+    for path in paths[: deck.MAX_LOADED_DECKS]:
+        deck.load_tiles(path)
+    deck.load_tiles(paths[0])
+    deck.load_tiles(paths[-1])
+    # the first deck was used again, the second one is the one evicted
+    cached = set(deck._loaded_decks)
+    assert digest(paths[0]) in cached
+    assert digest(paths[1]) not in cached
+    assert digest(paths[-1]) in cached
+    deck.clear_cache()
+
+
+def digest(path):
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
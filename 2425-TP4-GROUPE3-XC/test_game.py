@@ -0,0 +1,67 @@
+import game
+import player
+import random
+
+"""
+Tests of `game.Game.do_move` and `game.Game.undo_move`, the primitives of the
+searches, which must leave the game exactly as it was.
+"""
+
+
+def make_game(seed):
+    players = [
+        player.RandomPlayer(color=color, num_pawns=game.NUM_PAWNS)
+        for color in (player.Color.BLUE, player.Color.RED, player.Color.YELLOW)
+    ]
+    return game.Game(players=players, deck_path=None, seed=seed)
+
+
+def snapshot(game_state):
+    return (
+        game_state.zobrist_hash(),
+        game_state.current_tile(),
+        game_state.current_player().color,
+        [player_.num_pawns for player_ in game_state.players],
+        list(game_state.deck),
+        game_state.moves_played(),
+    )
+
+
+def play_out(game_state, rng):
+    """
+    Play random moves until the end of the game, and return the drawn tiles.
+    """
+    while not game_state.is_over():
+        game_state.do_move(rng.choice(game_state.get_possible_moves()))
+    return game_state.drawn_tiles()
+
+
+def test_undo_restores_state():
+    game_state = make_game(seed=1)
+    rng = random.Random(2)
+    for _ in range(10):
+        game_state.do_move(rng.choice(game_state.get_possible_moves()))
+    before = snapshot(game_state)
+    for _ in range(5):
+        game_state.do_move(rng.choice(game_state.get_possible_moves()))
+    for _ in range(5):
+        game_state.undo_move()
+    assert snapshot(game_state) == before
+
+
+def test_undo_keeps_later_draws():
+    reference = make_game(seed=3)
+    explored = make_game(seed=3)
+    # explore (and undo) moves before each move of the game
+    moves_rng = random.Random(4)
+    explore_rng = random.Random(5)
+    while not explored.is_over():
+        for _ in range(3):
+            depth = 0
+            while depth < 4 and not explored.is_over():
+                explored.do_move(explore_rng.choice(explored.get_possible_moves()))
+                depth += 1
+            for _ in range(depth):
+                explored.undo_move()
+        explored.do_move(moves_rng.choice(explored.get_possible_moves()))
+    assert explored.drawn_tiles() == play_out(reference, random.Random(4))
@@ -0,0 +1,53 @@
+import game
+import mcts
+import player
+
+"""
+Tests of the choice of moves by `player.AIPlayer`.
+"""
+
+
+def test_hard_penalises_moves_helping_opponents():
+    players = [
+        player.Player(color, game.NUM_PAWNS)
+        for color in (player.Color.BLUE, player.Color.RED, player.Color.YELLOW)
+    ]
+    game_state = game.Game(players=players, deck_path=None)
+    num_helping = 0
+    while not game_state.is_over():
+        color = game_state.current_player().color
+        possible_moves = game_state.get_possible_moves()
+        for move in possible_moves:
+            easy, hard = (
+                player.AIPlayer.evaluate_move_fn(
+                    move, color, difficulty, game_state.board, players
+                )
+                for difficulty in ("easy", "hard")
+            )
+            impact = player.AIPlayer.evaluate_opponent_impact(
+                move.position, color, game_state.board, players
+            )
+            # a move next to the links of opponents scores lower than with
+            # the EASY level, which ignores them
+            if impact < 0:
+                num_helping += 1
+                assert hard < easy
+            else:
+                assert hard == easy
+        game_state.apply_move(possible_moves[0])
+    assert num_helping > 0
+
+
+def test_mcts_default_budget_is_iterations():
+    players = [
+        player.AIPlayer(color, game.NUM_PAWNS, player.AILevel.MCTS, seed=1)
+        for color in (player.Color.BLUE, player.Color.RED)
+    ]
+    game_state = game.Game(players=players, deck_path=None, seed=2)
+    # a few tiles before the end, for short playouts
+    while len(game_state.deck) > 3:
+        game_state.apply_move(game_state.get_possible_moves()[0])
+    player_ = game_state.current_player()
+    player_.play(game_state.get_possible_moves(), game_state)
+    # the search is not cut by a time budget, whatever the speed of the machine
+    assert player_.last_search_stats.iterations == mcts.DEFAULT_ITERATIONS
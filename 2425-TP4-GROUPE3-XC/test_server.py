@@ -0,0 +1,178 @@
+import asyncio
+import deck
+import game
+import player
+import server
+
+"""
+Tests of the protocol of `server.GameServer`, with clients connected over TCP
+to a server listening on a free port of the local host.
+"""
+
+# The number of seconds a test waits for a line before failing.
+LINE_TIMEOUT = 30
+
+
+class Client:
+    """
+    A client of the server, reading its lines one at a time.
+    """
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, port):
+        client = cls(*await asyncio.open_connection(server.DEFAULT_HOST, port))
+        assert (await client.read())[:2] == ["HELLO", "mfc"]
+        return client
+
+    async def send(self, line):
+        self._writer.write((line + "\n").encode())
+        await self._writer.drain()
+
+    async def read(self):
+        line = await asyncio.wait_for(self._reader.readline(), LINE_TIMEOUT)
+        assert line, "connection closed"
+        return line.decode().split()
+
+    async def expect(self, command):
+        """
+        Skip the lines up to the next one of `command`, and return its words.
+        """
+        while True:
+            words = await self.read()
+            if words[0] == command:
+                return words
+
+    async def play_out(self):
+        """
+        Play the first possible move at each turn of the client, check that
+        the tiles sent are valid deck lines, and return the `OVER` line.
+        """
+        while True:
+            line = await asyncio.wait_for(self._reader.readline(), LINE_TIMEOUT)
+            command, _, rest = line.decode().rstrip("\n").partition(" ")
+            if command == "TURN":
+                _, tile_line = rest.split(" ", maxsplit=1)
+                deck.decode_line(1, tile_line)
+            elif command == "PLAY":
+                await self.send("MOVE 0")
+            elif command == "OVER":
+                return rest.split()
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+def run_with_server(test, **options):
+    """
+    Run the coroutine function `test` with the port of a fresh server created
+    with `options`.
+    """
+
+    async def main():
+        game_server = server.GameServer(**options)
+        listener = await game_server.start(port=0)
+        try:
+            await test(game_server, listener.sockets[0].getsockname()[1])
+        finally:
+            await game_server.close()
+
+    asyncio.run(main())
+
+
+def test_new_join_list_move():
+    async def test(game_server, port):
+        first, second = await Client.connect(port), await Client.connect(port)
+        await first.send("NEW remote,random,remote 7")
+        assert (await first.read())[:3] == ["JOINED", "1", "0"]
+        await second.send("LIST")
+        assert await second.read() == ["GAMES", "1:1"]
+        await second.send("JOIN 1")
+        assert (await second.read())[:3] == ["JOINED", "1", "2"]
+        # the player of the server chooses its moves in a worker process
+        first_over, second_over = await asyncio.gather(
+            first.play_out(), second.play_out()
+        )
+        assert first_over == second_over
+        assert game_server.num_games == 0
+        await second.send("LIST")
+        assert await second.read() == ["GAMES"]
+        await first.close()
+        await second.close()
+
+    run_with_server(test)
+
+
+def test_invalid_commands():
+    async def test(game_server, port):
+        client = await Client.connect(port)
+        await client.send("NEW remote x")
+        assert await client.read() == ["ERROR", "invalid", "seed"]
+        await client.send("NEW random")
+        assert (await client.read())[0] == "ERROR"
+        await client.send("MOVE 0")
+        assert await client.read() == ["ERROR", "not", "in", "a", "game"]
+        await client.send("JOIN 1")
+        assert (await client.read())[0] == "ERROR"
+        assert game_server.num_games == 0
+        await client.close()
+
+    run_with_server(test)
+
+
+def test_timeout_plays_first_move():
+    async def test(game_server, port):
+        client = await Client.connect(port)
+        # a solo game, started at once
+        await client.send("NEW remote 3")
+        await client.expect("STARTED")
+        first_move = (await client.expect("PLAY"))[2]
+        assert await client.read() == ["TIMEOUT"]
+        placed = await client.read()
+        assert placed[0] == "PLACED"
+        assert ":".join(placed[2:]) == first_move
+        await client.close()
+
+    run_with_server(test, move_timeout=0.1)
+
+
+def test_remote_play_is_fallback():
+    game_state = game.Game(
+        players=[player.RandomPlayer(player.Color.BLUE, game.NUM_PAWNS, seed=1)],
+        deck_path=None,
+        seed=2,
+    )
+    remote = server.RemotePlayer(player.Color.RED, game.NUM_PAWNS, None)
+    assert isinstance(remote, player.Player)
+    possible_moves = game_state.get_possible_moves()
+    assert remote.play(possible_moves, game_state) == possible_moves[0]
+
+
+def test_disconnect():
+    async def test(game_server, port):
+        first, second = await Client.connect(port), await Client.connect(port)
+        # the seat of a game not started yet opens again, and the game is
+        # dropped once no remote player is left
+        await first.send("NEW remote,remote")
+        await first.expect("JOINED")
+        await first.close()
+        await asyncio.sleep(0.1)
+        assert game_server.num_games == 0
+
+        # the turns of a player leaving a started game are timed out, while
+        # the game goes on for the others
+        first = await Client.connect(port)
+        await first.send("NEW remote,remote 5")
+        await first.expect("JOINED")
+        await second.send("JOIN 2")
+        await second.expect("STARTED")
+        await first.send("QUIT")
+        await first.close()
+        assert len(await second.play_out()) > 0
+        await second.close()
+
+    run_with_server(test)
@@ -0,0 +1,30 @@
+import deck
+import tile
+
+"""
+Tests of the equality and hashing of tiles.
+"""
+
+
+def test_equal_tiles_hash_equal():
+    tiles = deck.make_tiles()
+    for tile_ in tiles:
+        copy = tile.Tile.from_type(tile_.tile_type, tile_.rotation)
+        assert copy is not tile_
+        assert copy == tile_
+        assert hash(copy) == hash(tile_)
+
+
+def test_symmetric_rotations_hash_equal():
+    for tile_ in deck.make_tiles():
+        for quarter_turns in range(tile.NUM_ROTATIONS):
+            rotated = tile_.rotated(quarter_turns)
+            if rotated == tile_:
+                assert hash(rotated) == hash(tile_)
+
+
+def test_tiles_in_sets():
+    tiles = deck.make_tiles()
+    copies = [tile.Tile.from_type(tile_.tile_type, tile_.rotation) for tile_ in tiles]
+    assert set(tiles) == set(copies)
+    assert len({tile_: None for tile_ in tiles + copies}) == len(set(tiles))
@@ -0,0 +1,108 @@
+import deck
+import expectimax
+import game
+import itertools
+import player
+import transposition
+
+"""
+Tests of the transposition table used by the expectimax search.
+"""
+
+
+def transposed_game():
+    """
+    Return a one-player game whose next two tiles are of the same type, and
+    two orders of two moves (as absolute `(row, column, rotation)` triples)
+    reaching the same state.
+    """
+    tiles = deck.make_tiles()
+    start, first = tiles[0], tiles[1]
+    second = next(tile_ for tile_ in tiles[2:] if tile_.type_id == first.type_id)
+    rest = [tile_ for tile_ in tiles[2:] if tile_ is not second]
+    game_state = game.Game(
+        players=[player.Player(player.Color.BLUE, game.NUM_PAWNS)],
+        deck_path=None,
+        tiles=[start, first, second, *rest],
+    )
+    board_ = game_state.board
+    moves = [
+        (*board_.to_absolute(move.position), move.rotation)
+        for move in game_state.get_possible_moves()
+    ]
+    for one, other in itertools.combinations(moves, 2):
+        if one[:2] == other[:2]:
+            continue
+        hashes = []
+        for order in ((one, other), (other, one)):
+            if not play(game_state, order):
+                break
+            hashes.append(game_state.zobrist_hash())
+            for _ in order:
+                game_state.undo_move()
+        if len(hashes) == 2 and hashes[0] == hashes[1]:
+            return game_state, (one, other), (other, one)
+    raise AssertionError("no transposition found")
+
+
+def play(game_state, moves):
+    """
+    Play the passed moves (absolute triples) if they are all legal, and
+    return whether they were played.
+    """
+    board_ = game_state.board
+    for count, (row, column, rotation) in enumerate(moves):
+        move = next(
+            (
+                move
+                for move in game_state.get_possible_moves()
+                if board_.to_absolute(move.position) == (row, column)
+                and move.rotation == rotation
+            ),
+            None,
+        )
+        if move is None:
+            for _ in range(count):
+                game_state.undo_move()
+            return False
+        game_state.do_move(move)
+    return True
+
+
+def test_move_orders_share_entry():
+    game_state, first_order, second_order = transposed_game()
+    table = transposition.TranspositionTable()
+
+    assert play(game_state, first_order)
+    key = game_state.zobrist_hash()
+    first_move, first_stats = expectimax.search(game_state, depth=2, table=table)
+    assert first_stats.nodes > 0
+    num_entries = len(table)
+    for _ in first_order:
+        game_state.undo_move()
+
+    assert play(game_state, second_order)
+    assert game_state.zobrist_hash() == key
+    hits = table.hits
+    second_move, second_stats = expectimax.search(game_state, depth=2, table=table)
+    # the root is found in the table, and nothing is searched again
+    assert table.hits > hits
+    assert second_stats.nodes == 0
+    assert len(table) == num_entries
+    assert second_move == first_move
+
+
+def test_depth_preferred_policy():
+    table = transposition.TranspositionTable(
+        size=1, policy=transposition.ReplacementPolicy.DEPTH_PREFERRED
+    )
+    table.new_search()
+    assert table.store(1, depth=3, value=0.5)
+    # a shallower result for another state does not replace a deeper one
+    assert not table.store(2, depth=1, value=0.1)
+    assert table.lookup(1).value == 0.5
+    assert table.lookup(2) is None
+    # unless the deeper one comes from a previous search
+    table.new_search()
+    assert table.store(2, depth=1, value=0.1)
+    assert table.lookup(2).value == 0.1
@@ -37,22 +37,55 @@ SIDE_NEXT_COUNTERCLOCKWISE = {
     Side.WEST: Side.SOUTH,
 }
 
+OPPOSITE_SIDE = {
+    Side.NORTH: Side.SOUTH,
+    Side.EAST: Side.WEST,
+    Side.SOUTH: Side.NORTH,
+    Side.WEST: Side.EAST,
+}
+
+# The `(row, column)` offsets to the neighbouring cell on each side of a cell.
+SIDE_DELTAS = {
+    Side.NORTH: (-1, 0),
+    Side.EAST: (0, 1),
+    Side.SOUTH: (1, 0),
+    Side.WEST: (0, -1),
+}
+
 
-@dataclasses.dataclass(frozen=True)
+@dataclasses.dataclass(frozen=True, slots=True)
 class Link:
     """
     A link is a road segment joining two sides (represented as a frozenset) of a
-    tile, with the associated player color.
+    tile, with the associated player color. The links of the tile types are
+    interned (see `intern`).
     """
 
     sides: frozenset[Side]
-    color: player.Color
+    # quoted, as `player` may be partially initialised when this module is
+    # imported (through `array_board`)
+    color: "player.Color"
+
+    @classmethod
+    def intern(cls, sides, color):
+        """
+        Return the shared link joining the passed sides with `color`.
+        """
+        key = (frozenset(sides), color)
+        link = _LINKS.get(key)
+        if link is None:
+            link = _LINKS[key] = cls(sides=key[0], color=color)
+        return link
 
     def __str__(self):
         first_side, second_side = list(self.sides)
         return f"{first_side.value}-{second_side.value}:{self.color.value}"
 
 
+# The interned links, indexed by sides and color.
+_LINKS = {}
+
+
 TILE_HEIGHT = 5
 TILE_WIDTH = 9
 # fmt: off
@@ -83,123 +116,284 @@ LINK_POSITIONS = {
 # fmt: on
 
 
-class Tile:
+# The sides in clockwise order; a rotation by a quarter turn clockwise maps the
+# side at index `i` to the side at index `(i + 1) % 4`.
+SIDES = (Side.NORTH, Side.EAST, Side.SOUTH, Side.WEST)
+
+SIDE_INDEX = {side: index for index, side in enumerate(SIDES)}
+
+NUM_ROTATIONS = 4
+
+
+def _render_links(links):
     """
-    A tile is simply a list of links.
+    Return the representation of a tile with the passed links, as a tuple of
+    `TILE_HEIGHT` strings of `TILE_WIDTH` characters.
     """
-    links: List[Link] = field(default_factory=list)
+    chars = utils.make_2d_chars(height=TILE_HEIGHT, width=TILE_WIDTH, value=" ")
+    utils.set_2d_texts(chars, 0, 0, EMPTY_TILE)
+    for link in links:
+        color_row, color_column, road_segments = LINK_POSITIONS[link.sides]
+        utils.set_2d_text(
+            chars, color_row, color_column, player.COLOR_LETTER[link.color]
+        )
+        for row, column, text in road_segments:
+            utils.set_2d_text(chars, row, column, text)
+    return tuple("".join(line) for line in chars)
 
-    def get_link(self, side: Side) -> Optional[Link]:
-        """Retourne le lien connecté au côté spécifié, s'il existe."""
-        for link in self.links:
-            if side in link.sides:
-                return link
-        return None
 
-    def __init__(self, links):
-        assert len(links) <= 2, "invalid links"
-        assert all(map(lambda link: len(link.sides) == 2, links)), "invalid links"
-        assert (
-            len(links) < 2 or len(links[0].sides.union(links[1].sides)) == 4
-        ), "invalid links"
-        self._links = links
+class TileType:
+    """
+    A distinct kind of tile, i.e. a set of links (sides and colors) up to
+    rotation, identified by a small integer. The links, the side-to-link and
+    side-to-color tables, and the representation of the tile are precomputed
+    for each of the four rotations (indexed by the number of quarter turns
+    clockwise from the base orientation), so that a tile can be rotated,
+    compared and rendered with table lookups only.
+    """
+
+    def __init__(self, type_id, links):
+        self._type_id = type_id
+        self._links = []
+        self._side_links = []
+        self._side_colors = []
+        self._glyphs = []
+        for rotation in range(NUM_ROTATIONS):
+            rotated_links = tuple(
+                Link.intern(
+                    (
+                        SIDES[(SIDE_INDEX[side] + rotation) % NUM_ROTATIONS]
+                        for side in link.sides
+                    ),
+                    link.color,
+                )
+                for link in links
+            )
+            side_links = [None] * len(SIDES)
+            for link in rotated_links:
+                for side in link.sides:
+                    side_links[SIDE_INDEX[side]] = link
+            self._links.append(rotated_links)
+            self._side_links.append(tuple(side_links))
+            self._side_colors.append(
+                tuple(link.color if link is not None else None for link in side_links)
+            )
+            self._glyphs.append(_render_links(rotated_links))
+        # the first rotation giving the same links as each rotation
+        self._canonical_rotations = tuple(
+            self._side_links.index(side_links) for side_links in self._side_links
+        )
+        self._unique_rotations = tuple(sorted(set(self._canonical_rotations)))
+        self._variants = [None] * NUM_ROTATIONS
 
     @property
-    def links(self):
-        return self._links
+    def type_id(self):
+        return self._type_id
 
-    def _rotate_link(self, link, side_dict):
+    @property
+    def unique_rotations(self):
         """
-        Rotate the passed link by mapping each of its sides using `side_dict`.
+        The rotations giving pairwise different tiles, e.g. `(0,)` for a tile
+        with no links, and `(0, 1)` for a tile with a straight link.
         """
-        return Link(
-            sides=frozenset({side_dict[side] for side in link.sides}), color=link.color
-        )
+        return self._unique_rotations
+
+    def links(self, rotation):
+        return self._links[rotation]
 
-    def _rotate(self, side_dict):
+    def side_links(self, rotation):
         """
-        Rotate all the links of the tile, mapping each of their sides using `side_dict`.
+        Return the tuple of the links (or `None`) on each side of `SIDES`.
         """
-        self._links = [self._rotate_link(link, side_dict) for link in self._links]
+        return self._side_links[rotation]
 
-    def rotate_clockwise(self):
-        self._rotate(SIDE_NEXT_CLOCKWISE)
+    def side_colors(self, rotation):
+        """
+        Return the tuple of the link colors (or `None`) on each side of `SIDES`.
+        """
+        return self._side_colors[rotation]
 
-    def rotate_counterclockwise(self):
-        self._rotate(SIDE_NEXT_COUNTERCLOCKWISE)
+    def canonical_rotation(self, rotation):
+        return self._canonical_rotations[rotation]
 
-    def __str__(self):
-        first_side, second_side = list(self.sides)
-        return f"{first_side.value}-{second_side.value}:{self.color}"
+    def glyph(self, rotation):
+        """
+        Return the representation of the tile, as a tuple of `TILE_HEIGHT`
+        strings of `TILE_WIDTH` characters.
+        """
+        return self._glyphs[rotation]
 
-    def display_in_chars(self, chars, start_row, start_column):
+    def variant(self, rotation):
         """
-        Put the representation of the tile into the passed `chars` (list of
-        list of characters), using `start_row` and `start_column` as the
-        coordinates of the top left corner of the tile.
+        Return the shared, immutable `Tile` of this type with the passed
+        rotation (as a number of quarter turns clockwise), created on first
+        use.
         """
-        utils.set_2d_texts(chars, start_row, start_column, EMPTY_TILE)
-        for link in self._links:
-            color_row_delta, color_column_delta, road_segments = LINK_POSITIONS[
-                link.sides
-            ]
-            utils.set_2d_text(
-                chars,
-                start_row + color_row_delta,
-                start_column + color_column_delta,
-                player.COLOR_LETTER[link.color],
-            )
-            for row_delta, column_delta, text in road_segments:
-                utils.set_2d_text(
-                    chars, start_row + row_delta, start_column + column_delta, text
-                )
-    def get_adjacent_positions(self) -> List[Coords]:
+        rotation %= NUM_ROTATIONS
+        tile = self._variants[rotation]
+        if tile is None:
+            tile = self._variants[rotation] = Tile.from_type(self, rotation)
+        return tile
+
+    def is_variant(self, tile):
+        """
+        Return whether `tile` is one of the shared tiles returned by `variant`.
+        """
+        return tile is self._variants[tile.rotation]
+
+
+class TileCatalogue:
+    """
+    The registry of all the tile types met so far, indexed by type id, and
+    by the frozensets of links of each of their rotations.
+    """
+
+    def __init__(self):
+        self._types = []
+        self._index = {}
+
+    def __len__(self):
+        return len(self._types)
+
+    def __getitem__(self, type_id):
+        return self._types[type_id]
+
+    def __iter__(self):
+        return iter(self._types)
+
+    def lookup(self, links):
         """
-        Retourne une liste de positions vides qui sont adjacentes à une tuile déjà placée.
+        Return the `(tile_type, rotation)` couple matching the passed links,
+        registering a new type (whose base orientation is `links`) if needed.
         """
-        adjacent_positions = set()
+        key = frozenset(links)
+        found = self._index.get(key)
+        if found is None:
+            tile_type = TileType(len(self._types), links)
+            self._types.append(tile_type)
+            for rotation in range(NUM_ROTATIONS):
+                self._index.setdefault(
+                    frozenset(tile_type.links(rotation)), (tile_type, rotation)
+                )
+            found = self._index[key]
+        return found
+
 
-        # Parcourir toutes les tuiles placées et trouver les positions adjacentes
-        for row in range(self._height):
-            for col in range(self._width):
-                if self._tiles[row][col] is not None:  # Il y a une tuile ici
-                    # Vérifier les 4 directions autour
-                    for delta_row, delta_col in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                        adj_row = row + delta_row
-                        adj_col = col + delta_col
-                        if 0 <= adj_row < self._height and 0 <= adj_col < self._width:
-                            if self._tiles[adj_row][adj_col] is None:  # Position vide adjacente
-                                adjacent_positions.add(Coords(adj_row, adj_col))
+# The catalogue used for all the tiles of the program.
+CATALOGUE = TileCatalogue()
 
-        return list(adjacent_positions)
 
-    def generate_possible_moves(self, tile: 'Tile') -> List['Move']:
+class Tile:
+    """
+    A tile is simply a list of links, stored as a tile type from `CATALOGUE`
+    and a rotation.
+
+    Identical tiles can share a single instance (see `intern`), which must
+    then not be rotated in place; `rotated` returns such a shared instance.
+    """
+
+    __slots__ = ("_type", "_rotation")
+
+    def __init__(self, links):
+        assert len(links) <= 2, "invalid links"
+        assert all(map(lambda link: len(link.sides) == 2, links)), "invalid links"
+        assert (
+            len(links) < 2 or len(links[0].sides.union(links[1].sides)) == 4
+        ), "invalid links"
+        self._type, self._rotation = CATALOGUE.lookup(links)
+
+    @classmethod
+    def from_type(cls, tile_type, rotation=0):
+        """
+        Create a tile of the passed `TileType`, with the passed rotation (as a
+        number of quarter turns clockwise).
+        """
+        result = cls.__new__(cls)
+        result._type = tile_type
+        result._rotation = rotation % NUM_ROTATIONS
+        return result
+
+    @staticmethod
+    def intern(links):
         """
-        Génère tous les coups possibles pour une tuile donnée (positions adjacentes + rotations).
+        Return the shared, immutable tile with the passed links (see
+        `TileType.variant`).
         """
-        possible_moves = []
-        # Récupérer les positions adjacentes où on peut placer une tuile
-        adjacent_positions = self.get_adjacent_positions()
+        tile_type, rotation = CATALOGUE.lookup(links)
+        return tile_type.variant(rotation)
 
-        # Pour chaque position adjacente, générer les 4 rotations possibles
-        for position in adjacent_positions:
-            for rotation in [0, 90, 180, 270]:
-                possible_moves.append(Move(position=position, rotation=rotation))
+    @property
+    def tile_type(self):
+        return self._type
 
-        return possible_moves
+    @property
+    def type_id(self):
+        return self._type.type_id
 
-    def place_tile_with_rotation(self, coords: 'Coords', tile: 'Tile', rotation: int):
+    @property
+    def rotation(self):
+        return self._rotation
+
+    @property
+    def links(self):
+        return self._type.links(self._rotation)
+
+    @property
+    def side_colors(self):
+        return self._type.side_colors(self._rotation)
+
+    @property
+    def glyph(self):
+        """
+        The (cached) representation of the tile, as a tuple of `TILE_HEIGHT`
+        strings of `TILE_WIDTH` characters.
+        """
+        return self._type.glyph(self._rotation)
+
+    def get_link(self, side: Side) -> Optional[Link]:
+        """Retourne le lien connecté au côté spécifié, s'il existe."""
+        return self._type.side_links(self._rotation)[SIDE_INDEX[side]]
+
+    def rotated(self, quarter_turns):
         """
-        Place une tuile sur le plateau avec la rotation spécifiée.
+        Return the shared tile obtained by rotating this tile by the passed
+        number of quarter turns clockwise, leaving this tile unchanged.
         """
-        rotated_tile = self.rotate_tile(tile, rotation)
-        self._tiles[coords.row][coords.column] = rotated_tile
+        return self._type.variant(self._rotation + quarter_turns)
+
+    def rotate_clockwise(self):
+        assert not self._type.is_variant(self), "shared tiles are immutable"
+        self._rotation = (self._rotation + 1) % NUM_ROTATIONS
 
-    def rotate_tile(self, tile: 'Tile', rotation: int) -> 'Tile':
+    def rotate_counterclockwise(self):
+        assert not self._type.is_variant(self), "shared tiles are immutable"
+        self._rotation = (self._rotation - 1) % NUM_ROTATIONS
+
+    def __eq__(self, other):
+        if isinstance(other, Tile):
+            return self._type is other._type and self._type.canonical_rotation(
+                self._rotation
+            ) == other._type.canonical_rotation(other._rotation)
+        return NotImplemented
+
+    def __hash__(self):
+        # consistent with `__eq__`: a tile rotated in place must thus not be
+        # kept in a set or as a key (shared tiles are never rotated in place)
+        return hash(
+            (self._type.type_id, self._type.canonical_rotation(self._rotation))
+        )
+
+    def __str__(self):
+        if not self.links:
+            return "no links"
+        return " & ".join(map(str, self.links))
+
+    def display_in_chars(self, chars, start_row, start_column):
         """
-        Retourne une nouvelle tuile avec la rotation spécifiée (0, 90, 180, 270 degrés).
+        Put the representation of the tile into the passed `chars` (list of
+        list of characters), using `start_row` and `start_column` as the
+        coordinates of the top left corner of the tile.
         """
-        rotated_tile = Tile(links=tile.links[:])  # Créer une copie de la tuile
-        for _ in range(rotation // 90):
-            rotated_tile.rotate_clockwise()
-        return rotated_tile
\ No newline at end of file
+        utils.set_2d_texts(
+            chars, start_row, start_column, self._type.glyph(self._rotation)
+        )
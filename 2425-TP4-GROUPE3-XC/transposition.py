@@ -0,0 +1,126 @@
+import dataclasses
+import enum
+
+"""
+This module defines a bounded transposition table, i.e. a cache of search
+results indexed by the Zobrist hash of game states (see `zobrist`), letting a
+search reuse the result computed for a state reached by another order of
+moves.
+"""
+
+
+# The default number of slots of a table.
+DEFAULT_SIZE = 1 << 16
+
+
+class ReplacementPolicy(enum.Enum):
+    """
+    The possible policies deciding whether a new entry replaces the entry
+    stored in the same slot for another state:
+    - `ALWAYS`: the new entry always replaces the old one;
+    - `DEPTH_PREFERRED`: the new entry replaces the old one only if it comes
+      from a search at least as deep, or if the old one was stored during a
+      previous search (see `TranspositionTable.new_search`).
+    """
+
+    ALWAYS = "always"
+    DEPTH_PREFERRED = "depth-preferred"
+
+
+class Bound(enum.Enum):
+    """
+    The meaning of the value of an entry, with respect to the exact value of
+    the state.
+    """
+
+    EXACT = "exact"
+    LOWER = "lower"
+    UPPER = "upper"
+
+
+@dataclasses.dataclass(frozen=True)
+class TableEntry:
+    """
+    The result of the search of a state: its hash, the depth of the search,
+    its value, the kind of bound the value is, the best move found (if any),
+    and the generation of the search that stored it.
+    """
+
+    key: int
+    depth: int
+    value: float
+    bound: Bound
+    move: object
+    generation: int
+
+
+class TranspositionTable:
+    """
+    A transposition table with a fixed number of slots, each holding at most
+    one entry; the slot of a state is its hash modulo the number of slots.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, policy=ReplacementPolicy.DEPTH_PREFERRED):
+        assert size > 0, "invalid size"
+        self._slots = [None] * size
+        self._policy = policy
+        self._generation = 0
+        self._num_entries = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def size(self):
+        return len(self._slots)
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def __len__(self):
+        return self._num_entries
+
+    def new_search(self):
+        """
+        Mark the entries stored so far as stale, so that they are replaced
+        first by the depth-preferred policy. To be called before each search.
+        """
+        self._generation += 1
+
+    def clear(self):
+        self._slots = [None] * len(self._slots)
+        self._num_entries = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """
+        Return the entry stored for the state whose hash is `key`, or `None`.
+        """
+        entry = self._slots[key % len(self._slots)]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, value, bound=Bound.EXACT, move=None):
+        """
+        Store the result of the search of the state whose hash is `key`,
+        subject to the replacement policy. Returns whether it was stored.
+        """
+        index = key % len(self._slots)
+        old = self._slots[index]
+        if old is None:
+            self._num_entries += 1
+        elif (
+            self._policy == ReplacementPolicy.DEPTH_PREFERRED
+            and old.key != key
+            and old.generation == self._generation
+            and old.depth > depth
+        ):
+            return False
+        self._slots[index] = TableEntry(
+            key, depth, value, bound, move, self._generation
+        )
+        return True
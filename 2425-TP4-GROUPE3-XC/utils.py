@@ -6,7 +6,7 @@ easier.
 
 from dataclasses import dataclass
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Coords:
     row: int
     column: int
@@ -0,0 +1,72 @@
+import functools
+
+"""
+This module defines the 64-bit Zobrist keys used to hash game states: the
+hash of a state is the exclusive or of the keys of its components (placed
+tiles, player to move, pawn counts, deck composition), so that it can be
+updated in constant time when a single component changes.
+
+As the board is unbounded, keys are not stored in tables but derived on
+demand from the components by a fixed 64-bit mixing function; they are thus
+identical from one run to the other.
+"""
+
+MASK = (1 << 64) - 1
+
+# Distinct salts for the different kinds of components.
+_CELL = 0x1
+_PLAYER_TO_MOVE = 0x2
+_PAWNS = 0x3
+_DECK = 0x4
+_DRAWN_TILE = 0x5
+
+
+def mix(value):
+    """
+    Return a well-mixed 64-bit integer derived from `value` (the finalizer of
+    the SplitMix64 generator).
+    """
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _key(kind, first, second, third=0):
+    """
+    Return the key of a component of the passed kind, described by up to three
+    (possibly negative) integers. The keys used recently are cached, as
+    searches hash the same components over and over.
+    """
+    return mix(mix(mix(mix(kind) ^ (first & MASK)) ^ (second & MASK)) ^ (third & MASK))
+
+
+def cell_key(row, column, type_id, rotation):
+    """
+    Return the key of a tile of the passed type and (canonical) rotation at the
+    passed absolute coordinates.
+    """
+    return _key(_CELL, row, column, type_id * 4 + rotation)
+
+
+def player_to_move_key(player_index):
+    return _key(_PLAYER_TO_MOVE, player_index, 0)
+
+
+def pawns_key(player_index, num_pawns):
+    return _key(_PAWNS, player_index, num_pawns)
+
+
+def deck_key(type_id, count):
+    """
+    Return the key of the deck containing `count` tiles of the passed type.
+    """
+    return _key(_DECK, type_id, count)
+
+
+def drawn_tile_key(type_id):
+    """
+    Return the key of the tile drawn by the player to move.
+    """
+    return _key(_DRAWN_TILE, type_id, 0)